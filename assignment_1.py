@@ -1,161 +1,85 @@
-import copy
-from pprint import pprint
+import sys
+import time
 
-from assignment_1.algorithms import value_iteration, policy_iteration
 from assignment_1.config import *
-from assignment_1.grid import generate_maze
-from assignment_1.maze import Maze, MazeAction
-from assignment_1.plot import plot_utility_vs_iteration
-
-
-def solve_MDP():
+from assignment_1.experiments import EXPERIMENTS, run_experiments
+from assignment_1.grid import generate_grid, save_grid
+from assignment_1.profiling import Profiler
+
+
+def solve_MDP(
+    profile=False,
+    use_cache=True,
+    num_workers=None,
+    quiet=False,
+    result_formats=('txt',),
+):
     """
     Main function.
-    """
-    # value iteration
-    maze = Maze(
-        grid=GRID,
-        reward_mapping=REWARD_MAPPING,
-        starting_point=STARTING_POINT,
-        discount_factor=DISCOUNT_FACTOR
-    )
-    result = value_iteration(maze, max_error=MAX_ERROR)
-
-    _show_maze_result(maze, result, 'value_iteration_result.txt')
-
-    plot_utility_vs_iteration(
-        result['iteration_utilities'],
-        save_file_name='value_iteration_utilities.png'
-    )
-
-    # For approximation of reference utilities given in instructions,
-    # use discount factor of 0.95 and maximum error threshold of 1.4.
-    # Values obtained through trial and error.
-    maze = Maze(
-        grid=GRID,
-        reward_mapping=REWARD_MAPPING,
-        starting_point=STARTING_POINT,
-        discount_factor=REFERENCE_DISCOUNT_FACTOR
-    )
-    result = value_iteration(maze, max_error=REFERENCE_MAX_ERROR)
-
-    _show_maze_result(maze, result, 'approximate_reference_utilities_result.txt')
-
-    plot_utility_vs_iteration(
-        result['iteration_utilities'],
-        save_file_name='approximate_reference_utilities.png'
-    )
-
-    # policy iteration
-    maze = Maze(
-        grid=GRID,
-        reward_mapping=REWARD_MAPPING,
-        starting_point=STARTING_POINT,
-        discount_factor=DISCOUNT_FACTOR
-    )
-    result = policy_iteration(maze, num_policy_evaluation=100)
-    
-    _show_maze_result(maze, result, 'policy_iteration_result.txt')
-
-    plot_utility_vs_iteration(
-        result['iteration_utilities'],
-        save_file_name='policy_iteration_utilities.png'
-    )
-
-    bonus_grid_length = 100
-    bonus_grid = generate_maze(bonus_grid_length)
-
-    print('bonus grid, length =', bonus_grid_length)
-    with open(RESULTS_DIR_PATH + 'bonus_maze.txt', 'w') as file:
-        pprint(bonus_grid, file)
-
-    bonus_maze = Maze(
-        grid=bonus_grid,
-        reward_mapping=REWARD_MAPPING,
-        starting_point=STARTING_POINT,
-        discount_factor=DISCOUNT_FACTOR
-    )
 
-    result = value_iteration(bonus_maze, max_error=MAX_ERROR, verbose=True)
+    Runs every experiment in EXPERIMENTS (see assignment_1.experiments),
+    with plots saved into results instead of shown,
+    then prints the time of each phase, also saved into timings.json of results if profiled.
 
-    _show_maze_result(
-        bonus_maze, 
-        result, 
-        'bonus_value_iteration_result.txt'
-    )
-
-    plot_utility_vs_iteration(
-        result['iteration_utilities'],
-        'bonus_value_iteration_utilities.png'
-    )
-
-    result = policy_iteration(bonus_maze, NUM_POLICY_EVALUATION, verbose=True)
-
-    _show_maze_result(
-        bonus_maze, 
-        result, 
-        'bonus_policy_iteration_result.txt'
-    )
-
-    plot_utility_vs_iteration(
-        result['iteration_utilities'],
-        'bonus_policy_iteration_utilities.png'
-    )
-
-
-def _show_maze_result(maze, result, save_file_name=None):
-    """
     params:
-    - maze (Maze)
-    - result (dict): result of solving a maze
-    - save_file_name (str): name of file to save plot as; defaults to None (not saved)
+    - profile (bool): whether to trace peak memory of each phase (build, solve, write, plot)
+        as well as its time, and save them into timings.json; defaults to False
+    - use_cache (bool): whether to reuse results of the algorithms cached by earlier runs,
+        for the same grid, rewards, discount and parameters; defaults to True
+    - num_workers (int): number of processes to run experiments in;
+        defaults to None (number of CPUs)
+    - quiet (bool): whether to print the number of iterations of each experiment only,
+        instead of the utility of each state and the grid of optimal policy,
+        and of the progress of each solver; defaults to False
+    - result_formats (tuple): formats to save results as, from 'txt', 'npz' and 'csv'
+        (see assignment_1.export); defaults to ('txt',)
     """
-    lines = []
-
-    line = 'number of iterations required: ' + str(result['num_iterations'])
-    print(line)
-    lines.append(line)
-
-    utilities, optimal_policy = result['utilities'], result['optimal_policy']
-
-    optimal_policy_grid = copy.deepcopy(maze.grid)
-    action_symbol_map = {
-        MazeAction.MOVE_UP: '∧',
-        MazeAction.MOVE_DOWN: 'v',
-        MazeAction.MOVE_LEFT: '<',
-        MazeAction.MOVE_RIGHT: '>',
-    }
-
-    line = '---utility for each state (row, column)---'
-    print(line)
-    lines.append(line)
-
-    for state_position in maze.states:
-        if state_position[1] == 0:
-            print()
-
-        line = str(state_position) + ' - utility: {:.3f}'.format(utilities[state_position])
-        print(line)
-        lines.append(line)
-
-        action = optimal_policy[state_position]
-        action_symbol = action_symbol_map[action]
+    start_time = time.perf_counter()
+    profiler = Profiler(trace_memory=profile)
+
+    with profiler.phase('bonus: generate grid'):
+        bonus_grid = generate_grid(BONUS_GRID_LENGTH, seed=BONUS_MAZE_SEED)
+
+        print('bonus grid, length =', BONUS_GRID_LENGTH, '- seed =', BONUS_MAZE_SEED)
+        save_grid(RESULTS_DIR_PATH + 'bonus_maze.maze', bonus_grid)
+
+    summaries = run_experiments(
+        EXPERIMENTS,
+        num_workers,
+        profile,
+        use_cache,
+        quiet,
+        result_formats,
+    )
+    profiler.close()
 
-        optimal_policy_grid[state_position[0]][state_position[1]] = action_symbol
+    for summary in summaries:
+        profiler.phases.extend(summary['phases'])
 
-    line = '---optimal policy grid (w = wall)---'
-    print(line)
-    lines.append(line)
+    elapsed_seconds = time.perf_counter() - start_time
 
-    pprint(optimal_policy_grid)
-    print()
+    print(profiler.summary())
+    print('elapsed seconds:', '{:.3f}'.format(elapsed_seconds))
 
-    if save_file_name is not None:
-        with open(RESULTS_DIR_PATH + save_file_name, 'w') as file:
-            for line in lines:
-                file.write(line + '\n')
-            pprint(optimal_policy_grid, file)
+    if profile:
+        profiler.save(RESULTS_DIR_PATH + 'timings.json', extra={
+            'elapsed_seconds': elapsed_seconds,
+            'num_iterations': {
+                summary['name']: summary['num_iterations']
+                for summary in summaries
+            },
+        })
 
 
 if __name__ == '__main__':
-    solve_MDP()
+    args = sys.argv[1:]
+
+    solve_MDP(
+        profile='--profile' in args,
+        use_cache='--no-cache' not in args,
+        num_workers=1 if '--sequential' in args else None,
+        quiet='--quiet' in args,
+        result_formats=('txt',)
+        + (('npz',) if '--npz' in args else ())
+        + (('csv',) if '--csv' in args else ()),
+    )
@@ -3,10 +3,27 @@ Definition of reinforcement learning algorithms as functions in Python.
 
 In this file:
 - value iteration
-- policy iteration
+- incremental value iteration (after local edits of an MDP)
+- batched value iteration (many discounts / rewards / max errors at once)
+- policy iteration (k sweeps, adaptive sweeps, or exact policy evaluation)
+- prioritized sweeping
 """
+import heapq
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg
+
 from assignment_1.base import MarkovDecisionProcess
-from assignment_1.maze import MazeAction
+from assignment_1.compiled import CompiledMDP
+from assignment_1.history import HistoryRecorder
+from assignment_1.maze import CELL_TYPES, CompactMaze, MazeAction, encode_grid
+from assignment_1.observers import IterationInfo, notify
+
+# MDPs of at least this many states are solved in float32 by default (backend='numpy'),
+# to halve the memory of utilities and of every intermediate of a sweep
+FLOAT32_MIN_STATES = 2 ** 20
 
 
 # reference: value iteration algorithm,
@@ -15,6 +32,12 @@ def value_iteration(
     mdp: MarkovDecisionProcess,
     max_error=1,
     verbose=False,
+    backend='python',
+    sweep='jacobi',
+    state_order=None,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+    dtype=None,
 ):
     """
     params:
@@ -26,6 +49,27 @@ def value_iteration(
         discount γ
     - max_error (float): the maximum error allowed in the utility of any state
     - verbose (bool): determine whether to print information
+    - backend (str): 'python' loops over the states in dicts;
+        'numpy' compiles the MDP into arrays once,
+        then does each sweep with whole-array operations
+    - sweep (str): 'jacobi' only reads utilities of the previous sweep;
+        'gauss_seidel' updates utilities in place, one state at a time,
+        so that later states read utilities updated earlier in the same sweep;
+        'red_black' updates in place every (x + y) even state at once, then every odd one
+        (states must be x, y positions)
+    - state_order: order of states in each 'gauss_seidel' sweep;
+        None (order of mdp.states), 'alternating' (forward, then backward),
+        or a list of every state
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: observer, or list of observers, called with an IterationInfo
+        after each iteration, which stops early if any returns True
+        (see assignment_1.observers); defaults to None (not observed)
+    - dtype: float type of utilities and of every intermediate of a sweep
+        (backend='numpy' only); np.float32 halves their memory, and adds
+        a rounding error to the utility of any state ('rounding_error');
+        defaults to None (np.float32 for at least FLOAT32_MIN_STATES states,
+        unless max_error is too small for it, else np.float64)
 
     return: {
         'utilities': {
@@ -36,23 +80,58 @@ def value_iteration(
         },
         'num_iterations': num_iterations (int),
         'iteration_utilities': {
-            (x, y): [utility for each iteration (float)]
-        }
-    }
+            (x, y): [utility for each recorded iteration (float)]
+        },
+        'history': history (HistoryRecorder)
+    }, with backend='numpy':
+        'rounding_error': bound on the error in the utility of any state
+            from rounding to dtype, on top of max_error (float)
     """
+    if sweep not in ('jacobi', 'gauss_seidel', 'red_black'):
+        raise ValueError('unknown sweep: ' + str(sweep))
+
+    if dtype is not None and backend != 'numpy':
+        raise ValueError("dtype is only used by backend='numpy'")
+
+    if history is None:
+        history = HistoryRecorder()
+
+    if backend == 'numpy':
+        if sweep == 'gauss_seidel':
+            raise ValueError("gauss_seidel sweep is sequential; use backend='python'")
+
+        return _value_iteration_numpy(
+            mdp.compile(),
+            max_error,
+            verbose,
+            sweep,
+            history,
+            on_iteration,
+            dtype,
+        )
+    elif backend != 'python':
+        raise ValueError('unknown backend: ' + str(backend))
+
+    if sweep != 'jacobi':
+        return _value_iteration_in_place(
+            mdp,
+            max_error,
+            verbose,
+            _get_state_orders(mdp.states, sweep, state_order),
+            history,
+            on_iteration,
+        )
+
     # U,U′, vectors of utilities for states in S, initially zero
     current_utilities, new_utilities, optimal_policy = {}, {}, {}
 
-    # for: Plot of utility estimates as a function of the number of iterations
-    iteration_utilities = {}
-
     for state_position in mdp.states:
         current_utilities[state_position] = 0
         new_utilities[state_position] = 0
         optimal_policy[state_position] = None
 
-        # start with empty list since it is updated at start of iteration
-        iteration_utilities[state_position] = []
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(mdp.states)
 
     has_converged = False
     num_iterations = 0
@@ -61,9 +140,13 @@ def value_iteration(
     while not has_converged:
         for state_position in mdp.states:
             current_utilities[state_position] = new_utilities[state_position]  # U ← U′
-            iteration_utilities[state_position].append(current_utilities[state_position])
 
+        # recorded at start of iteration
+        history.record(num_iterations, current_utilities)
+
+        sweep_start_time = time.perf_counter()
         max_utility_change = 0  # δ ← 0
+        num_policy_changes = 0
 
         # for each state s in S do 
         for state_position in mdp.states:
@@ -75,7 +158,10 @@ def value_iteration(
             )
 
             new_utilities[state_position] = new_utility
-            optimal_policy[state_position] = new_action
+
+            if optimal_policy[state_position] is not new_action:
+                optimal_policy[state_position] = new_action
+                num_policy_changes += 1
 
             # if |U′[s]−U[s]| > δ then δ ← |U′[s]−U[s]|
             abs_utility_difference = abs(new_utilities[state_position] - \
@@ -93,10 +179,21 @@ def value_iteration(
                 '{:.6f}'.format(max_utility_change),
             )
 
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            max_utility_change,
+            num_policy_changes,
+            time.perf_counter() - sweep_start_time,
+            len(current_utilities),
+        )):
+            break
+
         # until δ < ϵ(1−γ)/γ
         has_converged = max_utility_change < \
             max_error * (1 - mdp.discount) / mdp.discount
 
+    history.finish()
+
     # algorithm: return U
     #
     # in my implementation, I return the optimal policy and number of iterations
@@ -105,16 +202,783 @@ def value_iteration(
         'utilities': current_utilities,
         'optimal_policy': optimal_policy,
         'num_iterations': num_iterations,
-        'iteration_utilities': iteration_utilities,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
     }
 
 
+def _value_iteration_in_place(
+    mdp: MarkovDecisionProcess,
+    max_error: float,
+    verbose: bool,
+    state_orders: list,
+    history: HistoryRecorder,
+    on_iteration,
+):
+    """
+    Same as value_iteration, but with a single vector of utilities U,
+    where U[s] is replaced as soon as it is updated (Gauss-Seidel).
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - state_orders (list): order of states for each sweep, taken in turns
+    - history (HistoryRecorder): records utilities at each iteration
+    - on_iteration: observer(s) called after each iteration; may be None
+
+    return: same as value_iteration, with utilities after the last sweep
+    """
+    # U, vector of utilities for states in S, initially zero
+    utilities, optimal_policy = {}, {}
+
+    for state_position in mdp.states:
+        utilities[state_position] = 0
+        optimal_policy[state_position] = None
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(mdp.states)
+
+    has_converged = False
+    num_iterations = 0
+
+    # repeat
+    while not has_converged:
+        history.record(num_iterations, utilities)
+
+        sweep_start_time = time.perf_counter()
+        max_utility_change = 0  # δ ← 0
+        num_policy_changes = 0
+        state_order = state_orders[num_iterations % len(state_orders)]
+
+        # for each state s in S, in this sweep's order do
+        for state_position in state_order:
+            # U[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′]
+            new_utility, new_action = _bellman_equation(
+                mdp,
+                state_position,
+                utilities,
+            )
+
+            abs_utility_difference = abs(new_utility - utilities[state_position])
+
+            utilities[state_position] = new_utility
+
+            if optimal_policy[state_position] is not new_action:
+                optimal_policy[state_position] = new_action
+                num_policy_changes += 1
+
+            if abs_utility_difference > max_utility_change:
+                max_utility_change = abs_utility_difference
+
+        num_iterations += 1
+
+        if verbose:
+            print(
+                'iteration:', num_iterations,
+                '-maximum change in the utility of any state:', 
+                '{:.6f}'.format(max_utility_change),
+            )
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            max_utility_change,
+            num_policy_changes,
+            time.perf_counter() - sweep_start_time,
+            len(state_order),
+        )):
+            break
+
+        # until δ < ϵ(1−γ)/γ
+        has_converged = max_utility_change < \
+            max_error * (1 - mdp.discount) / mdp.discount
+
+    history.finish()
+
+    return {
+        'utilities': utilities,
+        'optimal_policy': optimal_policy,
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+    }
+
+
+def _get_state_orders(states, sweep, state_order):
+    """
+    params:
+    - states: states of the MDP
+    - sweep (str): 'gauss_seidel' or 'red_black'
+    - state_order: see value_iteration
+
+    return: list of orders of states (list), 1 for each sweep, taken in turns
+    """
+    states = list(states)
+
+    if sweep == 'red_black':
+        return [[
+            state
+            for colour in (0, 1)
+            for state in states
+            if (state[0] + state[1]) % 2 == colour
+        ]]
+
+    if state_order is None:
+        return [states]
+    elif state_order == 'alternating':
+        return [states, states[::-1]]
+
+    state_order = list(state_order)
+
+    if len(state_order) != len(states) or set(state_order) != set(states):
+        raise ValueError('state_order must contain every state exactly once')
+
+    return [state_order]
+
+
+def _value_iteration_numpy(
+    compiled: CompiledMDP,
+    max_error: float,
+    verbose: bool,
+    sweep: str='jacobi',
+    history: HistoryRecorder=None,
+    on_iteration=None,
+    dtype=None,
+):
+    """
+    Same as value_iteration, but each sweep is done as gather / multiply / max
+    over every state at once ('jacobi'), or over every state of 1 colour at once
+    ('red_black').
+
+    params:
+    - compiled (CompiledMDP): the MDP to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - sweep (str): 'jacobi' or 'red_black'
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: observer(s) called after each iteration; defaults to None
+    - dtype: same as value_iteration
+
+    return: same as value_iteration
+    """
+    if history is None:
+        history = HistoryRecorder()
+
+    dtype = _get_dtype(compiled, max_error, dtype)
+    rounding_error = _get_rounding_error(compiled, dtype)
+
+    if verbose:
+        print(
+            'dtype:', dtype.name,
+            '-rounding error of any utility: at most',
+            '{:.3g}'.format(rounding_error),
+            '({:.3g}% of max_error)'.format(100 * rounding_error / max_error),
+        )
+
+    utilities, optimal_policy, num_iterations = run_numpy_sweeps(
+        compiled,
+        max_error,
+        verbose,
+        sweep,
+        history,
+        on_iteration,
+        dtype=dtype,
+    )
+
+    return {
+        'utilities': compiled.to_state_dict(utilities),
+        'optimal_policy': compiled.to_policy_dict(optimal_policy),
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+        'rounding_error': rounding_error,
+    }
+
+
+def run_numpy_sweeps(
+    compiled: CompiledMDP,
+    max_error: float,
+    verbose: bool,
+    sweep: str,
+    history: HistoryRecorder,
+    on_iteration,
+    initial_utilities=None,
+    dtype=np.float64,
+):
+    """
+    Sweeps of value_iteration with backend='numpy', until δ < ϵ(1−γ)/γ;
+    also started from the utilities of a coarser maze by multigrid value iteration.
+
+    Every array a sweep writes into is allocated once, before the 1st sweep:
+    U and U′ are 2 buffers that are swapped (not copied) after each sweep,
+    and every intermediate is written in place (out=).
+
+    params:
+    - same as _value_iteration_numpy
+    - initial_utilities (np.ndarray): utility of each state to start from, shape (S,);
+        defaults to None (zero)
+    - dtype: float type of utilities and intermediates; defaults to np.float64
+
+    return: (
+        utilities (np.ndarray of dtype),
+        optimal_policy: index of best action of each state (np.ndarray),
+        num_iterations (int),
+    )
+    """
+    num_states, num_actions = compiled.num_states, len(compiled.actions)
+    rewards = compiled.rewards.astype(dtype, copy=False)
+
+    # U,U′, vectors of utilities for states in S, initially zero
+    current_utilities = np.empty(num_states, dtype=dtype)
+    new_utilities = np.zeros(num_states, dtype=dtype)
+
+    if initial_utilities is not None:
+        new_utilities[:] = initial_utilities
+
+    utility_changes = np.empty(num_states, dtype=dtype)
+
+    optimal_policy = np.full(num_states, -1, dtype=np.intp)  # no action yet
+    previous_policy = np.empty_like(optimal_policy) if on_iteration is not None else None
+
+    if sweep == 'red_black':
+        # next states, probabilities and rewards of states of each colour,
+        # gathered once instead of on every sweep, with buffers of their intermediates
+        colour_transitions = []
+
+        for indices in _get_colour_indices(compiled.states):
+            next_states = compiled.next_states[indices]
+
+            colour_transitions.append((
+                indices,
+                next_states,
+                compiled.probabilities[indices].astype(dtype, copy=False),
+                rewards[indices],
+                np.empty(next_states.shape, dtype=dtype),  # P(s′|s, a)U[s′]
+                np.empty((len(indices), num_actions), dtype=dtype),  # ∑s′P(s′|s, a)U[s′]
+                np.empty(len(indices), dtype=dtype),  # U′ of the colour
+                np.empty(len(indices), dtype=np.intp),  # best action of the colour
+            ))
+    else:
+        work = compiled.work_buffers(dtype)
+        expected_utilities = np.empty((num_states, num_actions), dtype=dtype)
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(compiled.states)
+
+    has_converged = False
+    num_iterations = 0
+
+    # repeat
+    while not has_converged:
+        # U ← U′; U′ is overwritten by this sweep
+        current_utilities, new_utilities = new_utilities, current_utilities
+        history.record(num_iterations, current_utilities)
+
+        sweep_start_time = time.perf_counter()
+
+        if on_iteration is not None:
+            np.copyto(previous_policy, optimal_policy)
+
+        if sweep == 'red_black':
+            # states of the 2nd colour read utilities of the 1st colour updated just before
+            np.copyto(new_utilities, current_utilities)
+
+            for (
+                indices,
+                next_states,
+                probabilities,
+                colour_rewards,
+                colour_work,
+                colour_expected_utilities,
+                colour_utilities,
+                colour_policy,
+            ) in colour_transitions:
+                np.take(new_utilities, next_states, out=colour_work, mode='clip')
+                np.multiply(probabilities, colour_work, out=colour_work)
+                colour_work.sum(axis=2, out=colour_expected_utilities)
+
+                colour_expected_utilities.argmax(axis=1, out=colour_policy)
+                optimal_policy[indices] = colour_policy
+
+                colour_expected_utilities.max(axis=1, out=colour_utilities)
+                np.multiply(colour_utilities, compiled.discount, out=colour_utilities)
+                np.add(colour_rewards, colour_utilities, out=colour_utilities)
+                new_utilities[indices] = colour_utilities
+        else:
+            # ∑s′P(s′|s, a)U[s′] for every state s and action a
+            compiled.expected_utilities(current_utilities, out=expected_utilities, work=work)
+            expected_utilities.argmax(axis=1, out=optimal_policy)
+
+            # U′[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′]
+            expected_utilities.max(axis=1, out=new_utilities)
+            np.multiply(new_utilities, compiled.discount, out=new_utilities)
+            np.add(rewards, new_utilities, out=new_utilities)
+
+        # δ ← max |U′[s]−U[s]|
+        np.subtract(new_utilities, current_utilities, out=utility_changes)
+        np.abs(utility_changes, out=utility_changes)
+        max_utility_change = utility_changes.max(initial=0)
+
+        num_iterations += 1
+
+        if verbose:
+            print(
+                'iteration:', num_iterations,
+                '-maximum change in the utility of any state:', 
+                '{:.6f}'.format(max_utility_change),
+            )
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            float(max_utility_change),
+            int(np.count_nonzero(optimal_policy != previous_policy)),
+            time.perf_counter() - sweep_start_time,
+            compiled.num_states,
+        )):
+            break
+
+        # until δ < ϵ(1−γ)/γ
+        has_converged = max_utility_change < \
+            max_error * (1 - compiled.discount) / compiled.discount
+
+    history.finish()
+
+    # in-place sweeps return utilities after the last sweep, like _value_iteration_in_place
+    utilities = current_utilities if sweep == 'jacobi' else new_utilities
+
+    return utilities, optimal_policy, num_iterations
+
+
+def _get_dtype(compiled: CompiledMDP, max_error, dtype):
+    """
+    params:
+    - compiled (CompiledMDP): the MDP to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+    - dtype: same as value_iteration
+
+    return: float type to solve the MDP in (np.dtype)
+    """
+    if dtype is None:
+        if compiled.num_states < FLOAT32_MIN_STATES or \
+                not _has_resolution(compiled, max_error, np.dtype(np.float32)):
+            return np.dtype(np.float64)
+
+        return np.dtype(np.float32)
+
+    dtype = np.dtype(dtype)
+
+    if dtype not in (np.float32, np.float64):
+        raise ValueError('unknown dtype: ' + str(dtype))
+
+    if not _has_resolution(compiled, max_error, dtype):
+        raise ValueError('max_error is too small for ' + dtype.name + ': ' + str(max_error))
+
+    return dtype
+
+
+def _has_resolution(compiled: CompiledMDP, max_error, dtype):
+    """
+    returns: whether rounding to dtype in a sweep is small enough next to ϵ(1−γ)/γ
+        for δ < ϵ(1−γ)/γ to be met (bool)
+    """
+    threshold = max_error * (1 - compiled.discount) / compiled.discount
+
+    # rounding of 1 backup, at most half of the threshold
+    return 2 * _get_rounding_error(compiled, dtype) * (1 - compiled.discount) < threshold
+
+
+def _get_rounding_error(compiled: CompiledMDP, dtype):
+    """
+    Each backup sums K products and adds a reward, so rounds its utility by
+    at most about (K + 2) ε max |U| (ε of dtype), where max |U| ≤ max |R| / (1 − γ).
+    An error ρ in every backup adds up to at most ρ / (1 − γ)
+    (the fixed point of e ← γe + ρ).
+
+    returns: bound on the error in the utility of any state
+        from rounding to dtype (float)
+    """
+    max_utility = np.abs(compiled.rewards).max(initial=0) / (1 - compiled.discount)
+    backup_error = (compiled.probabilities.shape[2] + 2) * np.finfo(dtype).eps * max_utility
+
+    return float(backup_error / (1 - compiled.discount))
+
+
+def _get_colour_indices(states):
+    """
+    params:
+    - states: x, y position of each state
+
+    return: [
+        indices of states where x + y is even (np.ndarray),
+        indices of states where x + y is odd (np.ndarray),
+    ]
+    """
+    parities = np.array(list(states)).reshape(-1, 2).sum(axis=1) % 2
+
+    return [np.flatnonzero(parities == colour) for colour in (0, 1)]
+
+
+def incremental_value_iteration(
+    mdp: MarkovDecisionProcess,
+    previous_result: dict,
+    changed_states=None,
+    max_error=1,
+    verbose=False,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+):
+    """
+    Same as value_iteration, but starts from the utilities of a previous result,
+    and only backs up states near the ones changed since (a frontier),
+    e.g. after Maze.edit_cells or a new reward_mapping.
+
+    The first frontier is the changed states. After each sweep of the frontier,
+    the residual of each predecessor of a state whose utility changed by Δ
+    has grown by at most ∑ γ P(s′|s, a) Δ (as in prioritized_sweeping);
+    the next frontier is every state where that growth, since it was last backed up,
+    reaches ϵ(1−γ)/γ.
+    Once the frontier is empty, a sweep over every state checks that δ < ϵ(1−γ)/γ holds,
+    as in value_iteration; if it does not, sweeps over every state go on
+    until it does (i.e. value_iteration, from the utilities so far).
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to solve, after its edits
+    - previous_result (dict): result of solving the MDP before its edits,
+        e.g. by value_iteration; states that are new get a utility of 0
+    - changed_states: states whose reward or transitions changed;
+        defaults to None (unknown, so the first sweep is over every state)
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: same as value_iteration; defaults to None (not observed)
+
+    return: same as value_iteration, where each iteration is a sweep of the frontier,
+        and with 'num_backups': total number of backups performed (int)
+    """
+    compiled = mdp.compile()
+    threshold = max_error * (1 - compiled.discount) / compiled.discount
+    predecessors = compiled.predecessors()
+
+    previous_utilities = previous_result['utilities']
+    previous_policy = previous_result['optimal_policy']
+    action_indices = {action: index for index, action in enumerate(compiled.actions)}
+
+    # U, starting from the previous result
+    utilities = np.array([
+        previous_utilities.get(state, 0)
+        for state in compiled.states
+    ], dtype=float)
+    optimal_policy = np.array([
+        action_indices.get(previous_policy.get(state), -1)
+        for state in compiled.states
+    ], dtype=np.intp)
+
+    # growth of the residual of each state since it was last backed up
+    residual_bounds = np.zeros(compiled.num_states)
+
+    # None for a sweep over every state
+    if changed_states is None:
+        frontier = None
+    else:
+        state_indices = compiled.state_indices
+        frontier = np.unique(np.array(
+            [state_indices[state] for state in changed_states],
+            dtype=np.intp,
+        ))
+
+    if history is None:
+        history = HistoryRecorder()
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(compiled.states)
+
+    num_iterations, num_backups = 0, 0
+
+    while True:
+        history.record(num_iterations, utilities)
+
+        sweep_start_time = time.perf_counter()
+        previous_actions = optimal_policy.copy() if on_iteration is not None else None
+
+        if frontier is None:
+            # U′[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′], for every state
+            expected_utilities = compiled.expected_utilities(utilities)
+            optimal_policy = expected_utilities.argmax(axis=1)
+
+            new_utilities = compiled.rewards + \
+                compiled.discount * expected_utilities.max(axis=1)
+
+            max_utility_change = np.abs(new_utilities - utilities).max(initial=0)
+            num_sweep_backups = compiled.num_states
+
+            # until δ < ϵ(1−γ)/γ; U is kept as is, like value_iteration returns U rather than U′
+            has_converged = max_utility_change < threshold
+
+            if not has_converged:
+                utilities = new_utilities  # U ← U′
+        else:
+            # U[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′], for every state in the frontier
+            expected_utilities = (
+                compiled.probabilities[frontier] * \
+                    utilities[compiled.next_states[frontier]]
+            ).sum(axis=2)
+            new_utilities = compiled.rewards[frontier] + \
+                compiled.discount * expected_utilities.max(axis=1)
+
+            utility_changes = np.abs(new_utilities - utilities[frontier])
+            max_utility_change = utility_changes.max(initial=0)
+            num_sweep_backups = frontier.size
+
+            utilities[frontier] = new_utilities
+            optimal_policy[frontier] = expected_utilities.argmax(axis=1)
+
+            # backed up, so their growth starts again from 0;
+            # others keep theirs, even while below threshold
+            residual_bounds[frontier] = 0
+
+            # residual of each predecessor s of s′ grows by at most γ P(s′|s, a) Δ
+            is_changed = utility_changes > 0
+            changed_predecessors = predecessors[frontier[is_changed]]
+
+            np.add.at(
+                residual_bounds,
+                changed_predecessors.indices,
+                compiled.discount * changed_predecessors.data * np.repeat(
+                    utility_changes[is_changed],
+                    np.diff(changed_predecessors.indptr),
+                ),
+            )
+
+            candidates = np.unique(changed_predecessors.indices)
+            frontier = candidates[residual_bounds[candidates] >= threshold]
+
+            if frontier.size == 0:
+                frontier = None  # checked by a sweep over every state next
+
+            has_converged = False
+
+        num_iterations += 1
+        num_backups += num_sweep_backups
+
+        if verbose:
+            print(
+                'iteration:', num_iterations,
+                '-states backed up:', num_sweep_backups,
+                '-maximum change in the utility of any state:',
+                '{:.6f}'.format(max_utility_change),
+            )
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            float(max_utility_change),
+            int(np.count_nonzero(optimal_policy != previous_actions)),
+            time.perf_counter() - sweep_start_time,
+            num_sweep_backups,
+        )):
+            break
+
+        if has_converged:
+            break
+
+    history.finish()
+
+    return {
+        'utilities': compiled.to_state_dict(utilities),
+        'optimal_policy': compiled.to_policy_dict(optimal_policy),
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+        'num_backups': num_backups,
+    }
+
+
+def batched_value_iteration(
+    mdp: MarkovDecisionProcess,
+    configurations: list,
+    verbose=False,
+    on_iteration=None,
+):
+    """
+    Same as value_iteration with backend='numpy', for K configurations of the same MDP
+    at once, e.g. to sweep through discounts or rewards.
+
+    Utilities of every configuration are stacked into a (K, S) array,
+    so that each sweep is 1 sparse matrix product per action for every configuration,
+    instead of 1 gather of U[s′] per configuration.
+    Each configuration stops on its own δ < ϵ(1−γ)/γ,
+    after which it is left out of later sweeps.
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to solve
+    - configurations (list): 1 dict for each configuration, with any of: {
+        'discount': discount γ (float); defaults to mdp.discount,
+        'reward_mapping': maps colour to reward (dict), for mazes;
+            defaults to reward mapping of mdp,
+        'max_error': the maximum error allowed in the utility of any state (float);
+            defaults to 1,
+        'history': records utilities at each iteration (HistoryRecorder);
+            defaults to None (not recorded),
+    }
+    - verbose (bool): determine whether to print information
+    - on_iteration: same as value_iteration, where each IterationInfo is of the sweep
+        over every configuration left; defaults to None (not observed)
+
+    return: [result of each configuration, same as value_iteration (dict)]
+    """
+    compiled = mdp.compile()
+    action_matrices = compiled.action_matrices()
+    num_configurations = len(configurations)
+
+    discounts = np.array([
+        configuration.get('discount', mdp.discount)
+        for configuration in configurations
+    ], dtype=float)
+    thresholds = np.array([
+        configuration.get('max_error', 1)
+        for configuration in configurations
+    ], dtype=float) * (1 - discounts) / discounts
+    rewards = np.stack([
+        _get_configuration_rewards(mdp, configuration)
+        for configuration in configurations
+    ]) if configurations else np.zeros((0, compiled.num_states))
+
+    histories = [
+        configuration.get('history') or HistoryRecorder()
+        for configuration in configurations
+    ]
+
+    # U, vectors of utilities for states in S of each configuration, initially zero
+    utilities = np.zeros((num_configurations, compiled.num_states))
+    optimal_policies = np.full((num_configurations, compiled.num_states), -1, dtype=np.intp)
+    num_iterations = np.zeros(num_configurations, dtype=int)
+
+    for history in histories:
+        # for: Plot of utility estimates as a function of the number of iterations
+        history.start(compiled.states)
+
+    # indices of configurations that have not converged
+    active = np.arange(num_configurations)
+    num_sweeps = 0
+
+    while active.size > 0:
+        current_utilities = utilities[active]
+
+        for configuration_index, configuration_utilities in zip(active, current_utilities):
+            histories[configuration_index].record(
+                num_iterations[configuration_index],
+                configuration_utilities,
+            )
+
+        sweep_start_time = time.perf_counter()
+
+        # ∑s′P(s′|s, a)U[s′] for every action a, state s and configuration, of shape (A, S, K)
+        expected_utilities = np.stack([
+            matrix @ current_utilities.T
+            for matrix in action_matrices
+        ])
+
+        new_policies = expected_utilities.argmax(axis=0).T
+        num_policy_changes = int(np.count_nonzero(new_policies != optimal_policies[active]))
+        optimal_policies[active] = new_policies
+
+        # U′[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′]
+        new_utilities = rewards[active] + \
+            discounts[active, np.newaxis] * expected_utilities.max(axis=0).T
+
+        # δ ← max |U′[s]−U[s]|, of each configuration
+        max_utility_changes = np.abs(new_utilities - current_utilities).max(axis=1, initial=0)
+
+        num_iterations[active] += 1
+        num_sweeps += 1
+
+        # until δ < ϵ(1−γ)/γ; converged configurations keep U rather than U′,
+        # like value_iteration
+        has_converged = max_utility_changes < thresholds[active]
+        utilities[active[~has_converged]] = new_utilities[~has_converged]
+
+        if verbose:
+            print(
+                'iteration:', num_sweeps,
+                '-configurations left:', active.size,
+                '-maximum change in the utility of any state:',
+                '{:.6f}'.format(max_utility_changes.max()),
+            )
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_sweeps,
+            float(max_utility_changes.max()),
+            num_policy_changes,
+            time.perf_counter() - sweep_start_time,
+            active.size * compiled.num_states,
+        )):
+            break
+
+        active = active[~has_converged]
+
+    results = []
+
+    for configuration_index, history in enumerate(histories):
+        history.finish()
+
+        results.append({
+            'utilities': compiled.to_state_dict(utilities[configuration_index]),
+            'optimal_policy': compiled.to_policy_dict(optimal_policies[configuration_index]),
+            'num_iterations': int(num_iterations[configuration_index]),
+            'iteration_utilities': history.iteration_utilities(),
+            'history': history,
+        })
+
+    return results
+
+
+def _get_configuration_rewards(mdp: MarkovDecisionProcess, configuration: dict):
+    """
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to solve
+    - configuration (dict): see batched_value_iteration
+
+    return: float np.ndarray of shape (S,); reward of each state
+    """
+    if 'reward_mapping' not in configuration:
+        return mdp.compile().rewards
+
+    if not hasattr(mdp, 'reward_mapping'):
+        raise ValueError('reward_mapping is only for mazes, not ' + type(mdp).__name__)
+
+    # from the grid, so that the maze itself is left as it is
+    grid = mdp.grid if isinstance(mdp.grid, np.ndarray) else encode_grid(mdp.grid)
+    rewards_by_cell_type = np.array([
+        configuration['reward_mapping'].get(colour, 0)
+        for colour in CELL_TYPES
+    ], dtype=float)
+
+    # x, y position of each state, in order of compiled states
+    if isinstance(mdp, CompactMaze):
+        positions = mdp.positions
+    else:
+        positions = np.array(list(mdp.compile().states), dtype=np.intp).reshape(-1, 2)
+
+    return rewards_by_cell_type[grid[positions[:, 0], positions[:, 1]]]
+
+
+# schedules of the number of sweeps (k) of each policy evaluation of policy iteration
+EVALUATION_SCHEDULES = ('constant', 'increasing', 'decreasing')
+
+
 # reference: policy iteration algorithm,
 # as shown in figure 17.7 of Artificial Intelligence: A Modern Approach
 def policy_iteration(
     mdp: MarkovDecisionProcess, 
     num_policy_evaluation: int=1,
-    verbose: bool=False
+    verbose: bool=False,
+    evaluation: str='iterative',
+    tolerance: float=1e-8,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+    schedule: str='constant',
+    gap_ratio: float=0.1,
 ):
     """
     params:
@@ -124,8 +988,29 @@ def policy_iteration(
         transition model P(s′|s, a), 
         rewards R(s), 
         discount γ
-    - num_policy_evaluation (int): number of times to do policy evaluation (k)
+    - num_policy_evaluation (int): number of times to do policy evaluation (k);
+        the most sweeps of each policy evaluation, for 'adaptive' evaluation
     - verbose (bool): determines whether to print information
+    - evaluation (str): 'iterative' does k sweeps of policy evaluation;
+        'adaptive' does up to k sweeps, until the maximum change in utility of a sweep
+        is at most gap_ratio × γ × the improvement gap of the last policy improvement
+        (largest gain in expected utility of any state from changing its action);
+        'exact' solves (I − γP_π)U = R for the current policy
+        with a sparse iterative solver (1 iteration each);
+        a policy that is unchanged after an 'iterative' or 'adaptive' evaluation,
+        which only approximates its utilities, is evaluated exactly
+        and improved once more, so that it is only returned if it is optimal
+    - tolerance (float): residual tolerance of the solver, for 'exact' evaluation;
+        smallest maximum change in utility a sweep stops at, for 'adaptive' evaluation
+    - history (HistoryRecorder): records utilities at each iteration
+        (each sweep of policy evaluation); defaults to None (not recorded)
+    - on_iteration: observer, or list of observers, called with an IterationInfo
+        after each policy evaluation and improvement, which stops early if any returns True
+        (see assignment_1.observers); defaults to None (not observed)
+    - schedule (str): k of each policy evaluation, for 'iterative' and 'adaptive' evaluation;
+        'constant' (default) is k each time; 'increasing' is 1, 2, 4, ... up to k;
+        'decreasing' is k, k / 2, k / 4, ... down to 1, then k again
+    - gap_ratio (float): ratio of the improvement gap that 'adaptive' evaluation stops at
 
     return: {
         'utilities': {
@@ -136,63 +1021,344 @@ def policy_iteration(
         },
         'num_iterations': num_iterations (int),
         'iteration_utilities': {
-            (x, y): [utility for each iteration (float)]
-        }
+            (x, y): [utility for each recorded iteration (float)]
+        },
+        'history': history (HistoryRecorder)
     }
     """
+    compiled = mdp.compile()
+
     # U , a vector of utilities for states in S , initially zero
-    # π, a policy vector indexed by state, initially random
-    utilities, policy = {}, {}
+    # π, a policy vector indexed by state, initially first action
+    utilities = np.zeros(compiled.num_states)
+    policy = np.zeros(compiled.num_states, dtype=np.intp)
+
+    if history is None:
+        history = HistoryRecorder()
 
     # for: Plot of utility estimates as a function of the number of iterations
-    iteration_utilities = {}
+    # start with first utility in place since it is updated at end of iteration
+    history.start(compiled.states)
+    history.record(0, utilities)
 
-    for state_position in mdp.states:
-        utilities[state_position] = 0
-        policy[state_position] = MazeAction.MOVE_UP
+    if evaluation not in ('iterative', 'adaptive', 'exact'):
+        raise ValueError('unknown evaluation: ' + str(evaluation))
 
-        # start with first utility in place since it is updated at end of iteration
-        iteration_utilities[state_position] = [0]
+    if schedule not in EVALUATION_SCHEDULES:
+        raise ValueError('unknown schedule: ' + str(schedule))
 
     unchanged = False
     num_iterations = 0
+    num_evaluations = 0
+
+    # exported on first exact evaluation, as it does not change between iterations
+    exported = None
+    is_exact = evaluation == 'exact'
+
+    # no policy improvement yet, so the 1st adaptive evaluation is 1 sweep
+    improvement_gap = float('inf')
 
     # repeat
     while not unchanged:
+        iteration_start_time = time.perf_counter()
+        previous_utilities, previous_policy = utilities, policy
+
         # U ← POLICY-EVALUATION (π, U , mdp)
-        utilities, new_iteration_utilities = _policy_evaluation(
-            mdp, 
-            policy, 
-            utilities, 
-            num_policy_evaluation, 
-        )
+        if is_exact:
+            if exported is None:
+                exported = compiled.transition_matrices()
+
+            utilities = _policy_evaluation_exact(
+                exported,
+                compiled.discount,
+                policy,
+                utilities,
+                tolerance,
+            )
+            num_sweeps = 1
+            history.record(num_iterations + num_sweeps, utilities)
+            is_partial = False
+        else:
+            if evaluation == 'adaptive':
+                evaluation_tolerance = max(
+                    tolerance,
+                    gap_ratio * compiled.discount * improvement_gap,
+                )
+            else:
+                evaluation_tolerance = None
+
+            max_num_sweeps = _get_num_sweeps(num_policy_evaluation, schedule, num_evaluations)
+
+            utilities, num_sweeps = _policy_evaluation(
+                compiled,
+                policy,
+                utilities,
+                max_num_sweeps,
+                history,
+                num_iterations,
+                evaluation_tolerance,
+            )
+
+            # a finite number of sweeps only approximates U^π, whatever k is
+            is_partial = True
+
+        num_iterations += num_sweeps
+        num_evaluations += 1
 
-        policy, unchanged = _policy_improvement(mdp, policy, utilities)
+        # ∑s′P(s′|s, a)U[s′] of every state and action, read by the improvement
+        # (and so by the optimal policy returned)
+        q_values = compiled.expected_utilities(utilities)
 
-        num_iterations += num_policy_evaluation
-        print('unchanged:', unchanged, 'at iteration:', num_iterations)
+        policy, unchanged, improvement_gap = _policy_improvement(q_values, policy)
+
+        # after a partial evaluation, π may look unchanged only because U is far from U^π,
+        # so it is evaluated exactly and improved once more before it is returned
+        is_exact = evaluation == 'exact' or (unchanged and is_partial)
+
+        if unchanged and is_partial:
+            unchanged = False
 
         if verbose:
-            print('iteration:', num_iterations)
+            print('unchanged:', unchanged, 'at iteration:', num_iterations)
 
-        for state_position in mdp.states:
-            iteration_utilities[state_position].extend(new_iteration_utilities[state_position])
-            
-            if verbose:
-                print('at', state_position, '-best action:', policy[state_position])
+            for state_position, action in compiled.to_policy_dict(policy).items():
+                print('at', state_position, '-best action:', action)
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            float(np.abs(utilities - previous_utilities).max(initial=0)),
+            int(np.count_nonzero(policy != previous_policy)),
+            time.perf_counter() - iteration_start_time,
+            compiled.num_states * num_sweeps,
+        )):
+            break
+
+    history.finish()
 
     # algorithm: return π
     #
     # in my implementation, I return the utilities and number of iterations
     # as well, as they will come in useful later
     return {
-        'utilities': utilities,
-        'optimal_policy': policy,
+        'utilities': compiled.to_state_dict(utilities),
+        'optimal_policy': compiled.to_policy_dict(policy),
         'num_iterations': num_iterations,
-        'iteration_utilities': iteration_utilities,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
     }
 
 
+# reference: prioritized sweeping, as in Moore and Atkeson (1993),
+# with upper bounds of the Bellman residual of each state kept beside its priority
+def prioritized_sweeping(
+    mdp: MarkovDecisionProcess,
+    max_error=1,
+    verbose=False,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+):
+    """
+    Backs up 1 state at a time, the state with the largest Bellman residual first,
+    instead of sweeping through every state.
+
+    After a state's utility changes by Δ, the residual of each of its predecessors
+    can grow by at most γ P(s′|s, a) Δ. Its priority is the largest such growth since
+    it was last backed up, while the sum of them bounds its residual.
+    A popped state whose actual residual is below ϵ(1−γ)/γ is not updated.
+    Once every priority is below ϵ(1−γ)/γ, the states whose bound is not are queued
+    by their bound, so it stops when every residual is below ϵ(1−γ)/γ,
+    i.e. the same bound as value_iteration.
+
+    params:
+    - mdp (MarkovDecisionProcess): an MDP with 
+        states S, 
+        actions A(s), 
+        transition model P(s′|s, a), 
+        rewards R(s), 
+        discount γ
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: same as value_iteration, called after every such iteration,
+        with the maximum change and number of changed actions of its backups
+
+    return: same as value_iteration, where
+        num_iterations is the number of backups divided by the number of states (rounded up),
+        history records utilities at every such iteration,
+        and with 'num_backups': total number of backups performed,
+            including those of popped states that are not updated (int)
+    """
+    threshold = max_error * (1 - mdp.discount) / mdp.discount
+    predecessors = _get_predecessors(mdp)
+    num_states = len(mdp.states)
+
+    # U, vector of utilities for states in S, initially zero
+    utilities = {}
+
+    # with U = 0, the residual |R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′] − U[s]| is |R(s)|
+    residual_bounds = {}
+    priorities = {}
+
+    # state: tie breaker, for states whose residual bound is not below threshold
+    # since they were last backed up
+    states_to_check = {}
+
+    # heap of (-priority, tie breaker, state); entries with an outdated priority are skipped
+    priority_queue = []
+
+    for order, state_position in enumerate(mdp.states):
+        utilities[state_position] = 0
+        residual_bounds[state_position] = abs(mdp.reward_function(state_position))
+        priorities[state_position] = residual_bounds[state_position]
+
+        priority_queue.append((-priorities[state_position], order, state_position))
+
+    heapq.heapify(priority_queue)
+    num_backups = 0
+
+    if history is None:
+        history = HistoryRecorder()
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(mdp.states)
+    history.record(0, utilities)
+
+    # for on_iteration, over the backups since the last iteration
+    backed_up_actions = {}
+    iteration_start_time = time.perf_counter()
+    max_utility_change, num_policy_changes = 0, 0
+
+    while True:
+        if not priority_queue or -priority_queue[0][0] < threshold:
+            # largest priority is below threshold, so every priority is
+            if not states_to_check:
+                break  # and so is every residual bound
+
+            # priorities are not bounds on the residual, so queue these by their bound
+            priority_queue = []
+
+            for state_position, order in states_to_check.items():
+                priorities[state_position] = residual_bounds[state_position]
+                priority_queue.append((-priorities[state_position], order, state_position))
+
+            heapq.heapify(priority_queue)
+            states_to_check.clear()
+
+        negative_priority, order, state_position = heapq.heappop(priority_queue)
+
+        if -negative_priority != priorities[state_position]:
+            continue  # outdated entry
+
+        # U[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′]
+        new_utility, new_action = _bellman_equation(mdp, state_position, utilities)
+        utility_change = abs(new_utility - utilities[state_position])
+        num_backups += 1
+        states_to_check.pop(state_position, None)
+
+        if utility_change < threshold:
+            # its actual residual, so not updated
+            residual_bounds[state_position] = utility_change
+            priorities[state_position] = utility_change
+        else:
+            if utility_change > max_utility_change:
+                max_utility_change = utility_change
+
+            if backed_up_actions.get(state_position) is not new_action:
+                backed_up_actions[state_position] = new_action
+                num_policy_changes += 1
+
+            utilities[state_position] = new_utility
+            residual_bounds[state_position] = 0
+            priorities[state_position] = 0
+
+            for predecessor, (predecessor_order, probability) in predecessors[state_position].items():
+                residual_growth = mdp.discount * probability * utility_change
+                residual_bounds[predecessor] += residual_growth
+
+                if residual_bounds[predecessor] >= threshold:
+                    states_to_check[predecessor] = predecessor_order
+
+                if residual_growth > priorities[predecessor]:
+                    priorities[predecessor] = residual_growth
+
+                    heapq.heappush(
+                        priority_queue,
+                        (-residual_growth, predecessor_order, predecessor),
+                    )
+
+        # for: Plot of utility estimates as a function of the number of iterations
+        if num_backups % num_states == 0:
+            history.record(num_backups // num_states, utilities)
+
+            if verbose:
+                print(
+                    'backups:', num_backups,
+                    '-states in queue:', len(priority_queue),
+                )
+
+            if on_iteration is not None and notify(on_iteration, IterationInfo(
+                num_backups // num_states,
+                max_utility_change,
+                num_policy_changes,
+                time.perf_counter() - iteration_start_time,
+                num_states,
+            )):
+                break
+
+            iteration_start_time = time.perf_counter()
+            max_utility_change, num_policy_changes = 0, 0
+
+    history.finish()
+
+    # best action at each state, given the final utilities,
+    # from ∑s′P(s′|s, a)U[s′] of every state and action at once
+    compiled = mdp.compile()
+    q_values = compiled.expected_utilities(
+        np.array([utilities[state_position] for state_position in compiled.states])
+    )
+
+    return {
+        'utilities': utilities,
+        'optimal_policy': compiled.to_policy_dict(q_values.argmax(axis=1)),
+        'num_iterations': -(-num_backups // num_states),
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+        'num_backups': num_backups,
+    }
+
+
+def _get_predecessors(mdp: MarkovDecisionProcess):
+    """
+    Reverse of the transition table.
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to solve
+
+    return: {
+        next_state: {
+            state: (
+                order of state in mdp.states (int),
+                max a∈A(s) P(next_state|state, a) (float),
+            )
+        }
+    }
+    """
+    predecessors = {state_position: {} for state_position in mdp.states}
+    transition_table = mdp.transition_table
+
+    for order, state_position in enumerate(mdp.states):
+        for next_state_transitions in transition_table[state_position].values():
+            for next_state_position, probability in next_state_transitions:
+                state_predecessors = predecessors[next_state_position]
+                _, max_probability = state_predecessors.get(state_position, (order, 0))
+
+                if probability > max_probability:
+                    state_predecessors[state_position] = (order, probability)
+
+    return predecessors
+
+
 def _bellman_equation(
     mdp: MarkovDecisionProcess,
     state_position: tuple, 
@@ -214,9 +1380,7 @@ def _bellman_equation(
     max_expected_utility = float('-inf')
     best_action = None
 
-    action_next_state_map = mdp.states[state_position]
-
-    for action in action_next_state_map:
+    for action in mdp.actions:
         expected_utility = _get_expected_utility(
             mdp,
             state_position,
@@ -236,127 +1400,195 @@ def _bellman_equation(
 
 
 def _policy_evaluation(
-    mdp: MarkovDecisionProcess,
-    policy: dict, 
-    utilities: dict, 
+    compiled: CompiledMDP,
+    policy: np.ndarray,
+    utilities: np.ndarray,
     num_policy_evaluation: int,
+    history: HistoryRecorder,
+    num_iterations: int,
+    tolerance: float=None,
 ):
     """
     Simplified version of Bellman equation.
 
     params:
-    - mdp (MarkovDecisionProcess): an MDP with 
-        states S, 
-        actions A(s), 
-        transition model P(s′|s, a), 
-        rewards R(s), 
-        discount γ
-    - policy: {
-        (x, y): best action to take at this state (MazeAction)
-    }
-    - utilities: {
-        (x, y): utility value (float)
-    }
+    - compiled (CompiledMDP): the MDP to solve
+    - policy (np.ndarray): index of best action to take at each state, shape (S,)
+    - utilities (np.ndarray): utility value of each state, shape (S,)
     - num_policy_evaluation (int): number of times to do policy evaluation (k)
+    - history (HistoryRecorder): records utilities after each time
+    - num_iterations (int): number of iterations done before this policy evaluation
+    - tolerance (float): stops before k sweeps once the maximum change in utility
+        of any state in a sweep is at most this; defaults to None (k sweeps)
 
     return: (
-        { (x, y): updated utility value (float) },
-        { (x, y): [utility for each iteration (float)] }
+        updated utility value of each state (np.ndarray),
+        number of sweeps done (int),
     )
     """
-    current_utilities, updated_utilities = {}, {}
-    new_iteration_utilities = {}
+    # next states and probabilities of π(s) of every state, gathered once for k sweeps
+    state_indices = np.arange(compiled.num_states)
+    next_states = compiled.next_states[state_indices, policy].astype(np.intp, copy=False)
+    probabilities = compiled.probabilities[state_indices, policy]
+    products = np.empty(next_states.shape)
 
-    for state_position in mdp.states:
-        # U_i ← U
-        current_utilities[state_position] = utilities[state_position]
-        new_iteration_utilities[state_position] = []
+    # U_i ← U; U_i+1 is written into a buffer that is swapped with U_i after each time
+    current_utilities = np.array(utilities, dtype=float)
+    updated_utilities = np.empty_like(current_utilities)
+    utility_changes = np.empty_like(current_utilities)
+
+    num_sweeps = 0
 
     # for i in range(k)
-    for _ in range(num_policy_evaluation):
-        # for each state s in S do
-        for state_position in mdp.states:
-            reward = mdp.reward_function(state_position)
+    for i in range(num_policy_evaluation):
+        # ∑s′P (s'|s, π_i(s)) U_i(s'), of every state
+        np.take(current_utilities, next_states, out=products, mode='clip')
+        np.multiply(probabilities, products, out=products)
+        products.sum(axis=1, out=updated_utilities)
 
-            # ∑s′P (s'|s, π_i(s)) U_i(s')
-            expected_utility = _get_expected_utility(
-                mdp,
-                state_position,
-                policy[state_position],
-                current_utilities
-            )
+        # U_i+1(s) ← R(s) + γ ∑s′P (s'|s, π_i(s)) U_i(s')
+        np.multiply(updated_utilities, compiled.discount, out=updated_utilities)
+        np.add(compiled.rewards, updated_utilities, out=updated_utilities)
 
-            # U_i+1(s) ← R(s) + γ ∑s′P (s'|s, π_i(s)) U_i(s')
-            updated_utilities[state_position] = reward + mdp.discount * expected_utility
+        np.subtract(updated_utilities, current_utilities, out=utility_changes)
+        max_change = np.abs(utility_changes, out=utility_changes).max(initial=0)
 
         # U_i ← U_i+1
-        for state_position in mdp.states:
-            current_utilities[state_position] = updated_utilities[state_position]
-            new_iteration_utilities[state_position].append(current_utilities[state_position])
-            
+        current_utilities, updated_utilities = updated_utilities, current_utilities
+
+        num_sweeps = i + 1
+        history.record(num_iterations + num_sweeps, current_utilities)
+
+        if tolerance is not None and max_change <= tolerance:
+            break
 
-    return (current_utilities, new_iteration_utilities)
+    return current_utilities, num_sweeps
 
 
-def _policy_improvement(
-    mdp,
-    policy,
-    utilities, 
+def _get_num_sweeps(num_policy_evaluation: int, schedule: str, num_evaluations: int):
+    """
+    params:
+    - num_policy_evaluation (int): k
+    - schedule (str): see EVALUATION_SCHEDULES
+    - num_evaluations (int): number of policy evaluations done before this one
+
+    return: k of this policy evaluation (int)
+    """
+    if schedule == 'increasing':
+        return min(num_policy_evaluation, 2 ** num_evaluations)
+    elif schedule == 'decreasing':
+        # k, k / 2, ..., 1, then k again, rather than 1 sweep from then on
+        num_halvings = num_evaluations % max(num_policy_evaluation.bit_length(), 1)
+        return max(1, num_policy_evaluation >> num_halvings)
+
+    return num_policy_evaluation
+
+
+def _policy_evaluation_exact(
+    exported: dict,
+    discount: float,
+    policy: np.ndarray,
+    utilities: np.ndarray,
+    tolerance: float,
 ):
     """
+    Solves U = R + γ P_π U, i.e. (I − γP_π)U = R, for the current policy,
+    with BiCGSTAB preconditioned by the diagonal of (I − γP_π) (Jacobi).
+
     params:
-    - mdp (MarkovDecisionProcess): the MDP to solve
-    - policy: {
-        (x, y): best action to take at this state (MazeAction)
-    }
-    - utilities: {
-        (x, y): utility value (float)
-    }
+    - exported (dict): the MDP to solve (see CompiledMDP.transition_matrices)
+    - discount (float): discount γ
+    - policy (np.ndarray): index of best action to take at each state, shape (S,)
+    - utilities (np.ndarray): utility value of each state, shape (S,);
+        starting point of the solver
+    - tolerance (float): the maximum norm of the residual (I − γP_π)U − R
+
+    return: updated utility value of each state (np.ndarray)
+    """
+    num_states = len(exported['states'])
 
-    return: (
-        updated_policy (dict),
-        unchanged (bool),
+    # P_π: row s of the transition matrix of π(s)
+    policy_matrix = sparse.csr_matrix((num_states, num_states))
+
+    for action_index, matrix in enumerate(exported['transition_matrices']):
+        is_policy_action = (policy == action_index).astype(float)
+        policy_matrix = policy_matrix + sparse.diags(is_policy_action) @ matrix
+
+    system_matrix = (sparse.identity(num_states) - discount * policy_matrix).tocsr()
+    preconditioner = sparse.diags(1 / system_matrix.diagonal())
+
+    solution, info = _bicgstab(
+        system_matrix,
+        exported['rewards'],
+        utilities,
+        tolerance,
+        preconditioner,
     )
-    """
-    updated_policy = {}
-    unchanged = True  # unchanged? ← true
 
-    # for each state s in S do
-    for state_position in mdp.states:
-        # get max a∈A(s) ∑s′ P (s'|s, a) U [s']
-        max_expected_utility = float('-inf')
-        best_action = None
+    if info > 0:
+        raise RuntimeError(
+            'policy evaluation did not converge to tolerance ' + str(tolerance)
+        )
 
-        action_next_state_map = mdp.states[state_position]
+    return solution
 
-        for action in action_next_state_map:
-            expected_utility = _get_expected_utility(
-                mdp,
-                state_position,
-                action,
-                utilities
-            )
 
-        if expected_utility > max_expected_utility:
-            max_expected_utility = expected_utility
-            best_action = action
+def _bicgstab(matrix, vector, initial_guess, tolerance, preconditioner):
+    """
+    Calls scipy.sparse.linalg.bicgstab with an absolute residual tolerance.
 
-        # get ∑s′ P (s'|s, π[s]) U [s']
-        utility = _get_expected_utility(
-            mdp,
-            state_position,
-            policy[state_position],
-            utilities
+    return: (solution (np.ndarray), info (int))
+    """
+    try:
+        return linalg.bicgstab(
+            matrix,
+            vector,
+            x0=initial_guess,
+            rtol=0,
+            atol=tolerance,
+            M=preconditioner,
+        )
+    except TypeError:  # scipy < 1.12 names rtol as tol
+        return linalg.bicgstab(
+            matrix,
+            vector,
+            x0=initial_guess,
+            tol=0,
+            atol=tolerance,
+            M=preconditioner,
         )
 
-        # if max a∈A(s) ∑s′ P (s'|s, a) U [s'] > ∑s′ P (s'|s, π[s]) U [s'] then do
-        if max_expected_utility > utility:
-            updated_policy[state_position] = best_action
-            unchanged = False
-        else:
-            updated_policy[state_position] = policy[state_position]
 
-    return (updated_policy, unchanged)
+def _policy_improvement(q_values: np.ndarray, policy: np.ndarray):
+    """
+    params:
+    - q_values (np.ndarray): ∑s′ P (s'|s, a) U [s'] of every state and action, shape (S, A)
+    - policy (np.ndarray): index of best action to take at each state, shape (S,)
+
+    return: (
+        updated_policy (np.ndarray),
+        unchanged (bool),
+        improvement_gap: largest gain in expected utility of any state
+            from changing its action (float),
+    )
+    """
+    state_indices = np.arange(len(policy))
+
+    # get max a∈A(s) ∑s′ P (s'|s, a) U [s'], of every state
+    best_actions = q_values.argmax(axis=1)
+    max_expected_utilities = q_values[state_indices, best_actions]
+
+    # get ∑s′ P (s'|s, π[s]) U [s'], of every state
+    policy_expected_utilities = q_values[state_indices, policy]
+
+    # if max a∈A(s) ∑s′ P (s'|s, a) U [s'] > ∑s′ P (s'|s, π[s]) U [s'] then do
+    is_improved = max_expected_utilities > policy_expected_utilities
+    updated_policy = np.where(is_improved, best_actions, policy)
+
+    improvement_gap = (max_expected_utilities - policy_expected_utilities).max(initial=0)
+
+    # unchanged? ← true, unless any state is improved
+    return (updated_policy, not is_improved.any(), float(improvement_gap))
 
 
 def _get_expected_utility(
@@ -380,28 +1612,9 @@ def _get_expected_utility(
     """
     expected_utility = 0
 
-    possible_next_states = mdp.get_next_states(state_position, action)
-
-    for intended_next_state_position in possible_next_states:
-        # The intended state to move into is used (even if it is invalid).
-        # If there are more than 1 wall / border surrounding current state,
-        # there will be an overlap in next states, since they will end up
-        # remaining in the current state.
-        # If next_state_1 == next_state_2, the transition model defined
-        # will fail to calculate the correct probability, so intended state
-        # is used instead of actual state
-        probability = mdp.transition_model(
-            state_position,
-            action,
-            intended_next_state_position
-        )
-
-        # actual state used to calculate utility,
-        # since intended state may be invalid (wall / out of bounds)
-        actual_next_state_position = \
-            possible_next_states[intended_next_state_position]['actual']
-        next_state_utility = utilities[actual_next_state_position]
-
-        expected_utility += probability * next_state_utility
+    # actual next states are used (intended next state may be wall / out of bounds),
+    # with probabilities of intended next states that end up in the same one summed
+    for next_state_position, probability in mdp.transition_table[state_position][action]:
+        expected_utility += probability * utilities[next_state_position]
 
     return expected_utility
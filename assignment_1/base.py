@@ -4,6 +4,7 @@ Base classes are defined here.
 abstract classes:
 - MarkovDecisionProcess
 """
+from assignment_1.compiled import compile_mdp
 
 
 class MarkovDecisionProcess:
@@ -11,6 +12,9 @@ class MarkovDecisionProcess:
     Has the Markov property - the likelihood of future states of the process
     depends only on the present state, not the sequence of states that preceeds it.
     """
+    # so that subclasses can do without a per-instance __dict__
+    __slots__ = ('states', 'actions', 'discount', '_transition_table', '_compiled')
+
     def __init__(self, states, actions, discount):
         """
         Initialise states, actions and discount.
@@ -19,6 +23,10 @@ class MarkovDecisionProcess:
         self.actions = actions
         self.discount = discount
 
+        # built on first use; see transition_table and compile
+        self._transition_table = None
+        self._compiled = None
+
     def transition_model(self, state, action, next_state) -> float:
         """
         returns: the probability of transitioning into the next state,
@@ -41,3 +49,89 @@ class MarkovDecisionProcess:
         return: possible next states
         """
         pass
+
+    @property
+    def transition_table(self):
+        """
+        Built once, and read directly by the algorithms
+        instead of calling get_next_states and transition_model on every backup.
+
+        returns: {
+            state: {
+                action: (
+                    (actual_next_state_1, probability),
+                    ...,
+                    (actual_next_state_k, probability),
+                ),
+            }
+        }
+        """
+        if self._transition_table is None:
+            self._transition_table = self._build_transition_table()
+
+        return self._transition_table
+
+    def compile(self):
+        """
+        Built once from the transition table.
+
+        returns: the MDP in array form (CompiledMDP)
+        """
+        if self._compiled is None:
+            self._compiled = compile_mdp(self)
+
+        self._compiled.discount = self.discount  # discount may be changed freely
+        return self._compiled
+
+    def transition_matrices(self):
+        """
+        Exports the MDP as 1 sparse matrix per action,
+        so that a sweep can be done as sparse matrix-vector products.
+
+        returns: {
+            'states': [state at each index],
+            'actions': [action at each index],
+            'transition_matrices': [
+                scipy.sparse.csr_matrix of shape (S, S) for each action,
+                    where row s holds P(s′|s, a) of every next state s′
+            ],
+            'rewards': np.ndarray of shape (S,),
+            'state_indices': { state: index },
+        }
+        """
+        return self.compile().transition_matrices()
+
+    def invalidate_transition_table(self):
+        """
+        To be called whenever states or transitions change,
+        so that the transition table (and compiled form) is rebuilt on next use.
+        """
+        self._transition_table = None
+        self._compiled = None
+
+    def _build_transition_table(self):
+        """
+        returns: transition table, from get_next_states and transition_model
+        """
+        transition_table = {}
+
+        for state in self.states:
+            transition_table[state] = {}
+
+            for action in self.actions:
+                possible_next_states = self.get_next_states(state, action)
+                next_state_probabilities = {}
+
+                for intended_next_state in possible_next_states:
+                    # The intended state is used to look up the probability,
+                    # since more than 1 intended state may end up in
+                    # the same actual state (e.g. walls on 2 sides).
+                    probability = self.transition_model(state, action, intended_next_state)
+                    actual_next_state = possible_next_states[intended_next_state]['actual']
+
+                    next_state_probabilities[actual_next_state] = \
+                        next_state_probabilities.get(actual_next_state, 0) + probability
+
+                transition_table[state][action] = tuple(next_state_probabilities.items())
+
+        return transition_table
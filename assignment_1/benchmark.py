@@ -0,0 +1,364 @@
+"""
+Benchmarks of the algorithms on a fixed corpus of mazes.
+
+usage:
+- python3 -m assignment_1.benchmark run [--output FILE] [--solvers ...] [--mazes ...]
+- python3 -m assignment_1.benchmark compare BASELINE_FILE CURRENT_FILE [--threshold 0.2]
+
+Each (maze, solver) case runs in a fresh process, so that its peak RSS is its own.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+
+from assignment_1.algorithms import prioritized_sweeping, policy_iteration, value_iteration
+from assignment_1.components import component_value_iteration
+from assignment_1.config import *
+from assignment_1.grid import generate_grid
+from assignment_1.maze import CompactMaze, Maze, decode_grid
+from assignment_1.multigrid import multigrid_value_iteration
+
+# seed of every generated maze in the corpus
+BENCHMARK_SEED = 4046
+
+# name: grid length (None for the given GRID)
+CORPUS = {
+    'given': None,
+    'generated_10': 10,
+    'generated_100': 100,
+    'generated_500': 500,
+    'generated_2000': 2000,
+}
+
+# name: (solve function, maze class, largest grid length to run it on)
+SOLVERS = {
+    'value_iteration': (
+        lambda maze: value_iteration(maze, max_error=MAX_ERROR),
+        Maze,
+        100,
+    ),
+    'value_iteration_numpy': (
+        lambda maze: value_iteration(maze, max_error=MAX_ERROR, backend='numpy'),
+        CompactMaze,
+        2000,
+    ),
+    'value_iteration_red_black_numpy': (
+        lambda maze: value_iteration(
+            maze,
+            max_error=MAX_ERROR,
+            backend='numpy',
+            sweep='red_black',
+        ),
+        CompactMaze,
+        2000,
+    ),
+    'multigrid_value_iteration': (
+        lambda maze: multigrid_value_iteration(maze, max_error=MAX_ERROR),
+        CompactMaze,
+        2000,
+    ),
+    'parallel_value_iteration': (
+        lambda maze: _parallel_value_iteration(maze, max_error=MAX_ERROR),
+        CompactMaze,
+        2000,
+    ),
+    'component_value_iteration': (
+        lambda maze: component_value_iteration(maze, max_error=MAX_ERROR),
+        CompactMaze,
+        500,
+    ),
+    'prioritized_sweeping': (
+        lambda maze: prioritized_sweeping(maze, max_error=MAX_ERROR),
+        Maze,
+        100,
+    ),
+    'policy_iteration': (
+        lambda maze: policy_iteration(maze, NUM_POLICY_EVALUATION),
+        Maze,
+        100,
+    ),
+    'policy_iteration_adaptive': (
+        lambda maze: policy_iteration(maze, NUM_POLICY_EVALUATION, evaluation='adaptive'),
+        Maze,
+        100,
+    ),
+    'policy_iteration_exact': (
+        lambda maze: policy_iteration(maze, evaluation='exact'),
+        Maze,
+        100,
+    ),
+}
+
+# measurements compared by compare_benchmarks; higher is worse for each
+COMPARED_MEASUREMENTS = ('solve_seconds', 'peak_rss_bytes')
+
+
+def run_benchmarks(maze_names=None, solver_names=None):
+    """
+    params:
+    - maze_names (list): names in CORPUS; defaults to None (every maze)
+    - solver_names (list): names in SOLVERS; defaults to None (every solver)
+
+    return: {
+        'created': time of run (str),
+        'python': Python version (str),
+        'machine': description of machine (str),
+        'cases': [result of each case (dict); see _run_case], where a case whose process
+            ended without a result (e.g. raised, or was killed when out of memory) is {
+                'maze': maze name (str),
+                'solver': solver name (str),
+                'error': why it failed (str),
+            }
+    }
+    """
+    maze_names = list(CORPUS) if maze_names is None else maze_names
+    solver_names = list(SOLVERS) if solver_names is None else solver_names
+    cases = []
+
+    # fresh process for each case
+    context = multiprocessing.get_context('spawn')
+
+    for maze_name in maze_names:
+        grid_length = CORPUS[maze_name]
+
+        for solver_name in solver_names:
+            _, _, max_grid_length = SOLVERS[solver_name]
+
+            if grid_length is not None and grid_length > max_grid_length:
+                continue
+
+            # not a Pool, since its daemonic workers could not start a pool of their own
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_case,
+                args=(maze_name, solver_name, sender),
+            )
+            process.start()
+
+            # so that recv raises EOFError once the process ends, instead of waiting forever
+            sender.close()
+
+            try:
+                case = receiver.recv()
+            except EOFError:
+                case = None
+
+            receiver.close()
+            process.join()
+
+            if case is None or process.exitcode != 0:
+                case = {
+                    'maze': maze_name,
+                    'solver': solver_name,
+                    'error': 'process ended with exit code ' + str(process.exitcode),
+                }
+
+                print(maze_name, solver_name, '-failed:', case['error'])
+            else:
+                print(
+                    maze_name, solver_name,
+                    '-solve seconds:', '{:.3f}'.format(case['solve_seconds']),
+                    '-iterations:', case['num_iterations'],
+                    '-backups/s:', '{:.0f}'.format(case['backups_per_second']),
+                )
+
+            cases.append(case)
+
+    return {
+        'created': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.platform() + ', ' + str(multiprocessing.cpu_count()) + ' CPUs',
+        'cases': cases,
+    }
+
+
+def compare_benchmarks(baseline, current, threshold=0.2):
+    """
+    params:
+    - baseline (dict): result of run_benchmarks to compare against
+    - current (dict): result of run_benchmarks
+    - threshold (float): allowed relative increase of each measurement
+
+    return: [
+        {
+            'maze': maze name (str),
+            'solver': solver name (str),
+            'measurement': name of measurement (str),
+            'baseline': baseline value (float),
+            'current': current value (float),
+        }
+    ], 1 for each regression; a case that failed (see run_benchmarks) where
+        the baseline did not is a regression of measurement 'error',
+        with baseline None and current its error
+    """
+    baseline_cases = {
+        (case['maze'], case['solver']): case
+        for case in baseline['cases']
+    }
+    regressions = []
+
+    for case in current['cases']:
+        baseline_case = baseline_cases.get((case['maze'], case['solver']))
+
+        if baseline_case is None or 'error' in baseline_case:
+            continue
+
+        if 'error' in case:
+            regressions.append({
+                'maze': case['maze'],
+                'solver': case['solver'],
+                'measurement': 'error',
+                'baseline': None,
+                'current': case['error'],
+            })
+            continue
+
+        for measurement in COMPARED_MEASUREMENTS:
+            if case[measurement] > baseline_case[measurement] * (1 + threshold):
+                regressions.append({
+                    'maze': case['maze'],
+                    'solver': case['solver'],
+                    'measurement': measurement,
+                    'baseline': baseline_case[measurement],
+                    'current': case[measurement],
+                })
+
+    return regressions
+
+
+def _run_case(maze_name, solver_name, sender):
+    """
+    params:
+    - maze_name (str): name in CORPUS
+    - solver_name (str): name in SOLVERS
+    - sender (multiprocessing.connection.Connection): to send the result through
+
+    sends: {
+        'maze': maze_name (str),
+        'solver': solver_name (str),
+        'num_states': number of states (int),
+        'build_seconds': wall time to build the maze (float),
+        'solve_seconds': wall time until the solver converges (float),
+        'num_iterations': number of sweeps (int),
+        'num_backups': number of Bellman backups (int),
+        'backups_per_second': num_backups / solve_seconds (float),
+        'peak_rss_bytes': peak resident set size of the process (int),
+    }
+    """
+    solve, maze_class, _ = SOLVERS[solver_name]
+    grid_length = CORPUS[maze_name]
+
+    start_time = time.perf_counter()
+
+    if grid_length is None:
+        grid = GRID
+    else:
+        grid = generate_grid(grid_length, seed=BENCHMARK_SEED)
+
+        if maze_class is Maze:
+            grid = decode_grid(grid)
+
+    maze = maze_class(
+        grid=grid,
+        reward_mapping=REWARD_MAPPING,
+        starting_point=STARTING_POINT,
+        discount_factor=DISCOUNT_FACTOR
+    )
+
+    build_seconds = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+
+    result = solve(maze)
+
+    solve_seconds = time.perf_counter() - start_time
+    num_states = len(maze.states)
+    num_backups = result.get('num_backups', result['num_iterations'] * num_states)
+
+    # kilobytes on Linux
+    peak_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    sender.send({
+        'maze': maze_name,
+        'solver': solver_name,
+        'num_states': num_states,
+        'build_seconds': build_seconds,
+        'solve_seconds': solve_seconds,
+        'num_iterations': result['num_iterations'],
+        'num_backups': num_backups,
+        'backups_per_second': num_backups / solve_seconds if solve_seconds > 0 else 0,
+        'peak_rss_bytes': peak_rss_bytes,
+    })
+
+
+def _parallel_value_iteration(maze, **parameters):
+    """
+    parallel_value_iteration, imported only when its case runs,
+    since it needs Python 3.8 (see assignment_1.parallel)
+
+    params:
+    - maze (Maze or CompactMaze): the maze to solve
+    - parameters: parameters of parallel_value_iteration
+
+    return: same as parallel_value_iteration
+    """
+    from assignment_1.parallel import parallel_value_iteration
+
+    return parallel_value_iteration(maze, **parameters)
+
+
+def main(args=None):
+    """
+    Command line entry point; see module docstring.
+
+    return: exit status (int); 1 if any case of run fails, or compare finds any regression
+    """
+    parser = argparse.ArgumentParser(description='benchmarks of the algorithms')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks and save results')
+    run_parser.add_argument('--output', default=RESULTS_DIR_PATH + 'benchmark.json')
+    run_parser.add_argument('--mazes', nargs='+', choices=list(CORPUS))
+    run_parser.add_argument('--solvers', nargs='+', choices=list(SOLVERS))
+
+    compare_parser = subparsers.add_parser('compare', help='flag regressions against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2)
+
+    args = parser.parse_args(args)
+
+    if args.command == 'run':
+        results = run_benchmarks(args.mazes, args.solvers)
+
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+        print('results saved to', args.output)
+        return 1 if any('error' in case for case in results['cases']) else 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    with open(args.current) as file:
+        current = json.load(file)
+
+    regressions = compare_benchmarks(baseline, current, args.threshold)
+
+    for regression in regressions:
+        print(
+            'regression:', regression['maze'], regression['solver'],
+            '-' + regression['measurement'] + ':',
+            regression['baseline'], '->', regression['current'],
+        )
+
+    print(len(regressions), 'regression(s) beyond', '{:.0%}'.format(args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+On-disk cache of results of the algorithms, keyed by a hash of
+everything that determines a result: grid, reward mapping, discount, stencil,
+solver, and parameters of the solver.
+
+Each result is stored as an .npz file named by its key.
+Once the files add up to more than the size bound of the cache,
+the least recently used ones are removed.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from assignment_1.history import HistoryRecorder, MemoryHistory
+from assignment_1.maze import encode_grid
+
+# to be increased whenever a change to the algorithms changes their results,
+# so that results cached before are not used
+CACHE_VERSION = 6
+
+# parameters of the algorithms that do not change a result
+# (history is part of the key separately; see _describe_history)
+IGNORED_PARAMETERS = ('verbose', 'on_iteration', 'history')
+
+# keys of a result stored as their own arrays; see ResultCache.save
+RESULT_KEYS = ('utilities', 'optimal_policy', 'num_iterations', 'iteration_utilities', 'history')
+
+
+class ResultCache:
+    """
+    usage:
+        cache = ResultCache('assignment_1/.cache/')
+        result = cache.solve(value_iteration, maze, max_error=20)
+
+    Only results of mazes (Maze or CompactMaze) are cached,
+    with history off (HistoryRecorder) or recorded in memory (MemoryHistory);
+    other calls are passed to the solver as is.
+    Observers (on_iteration) are not called when a cached result is used.
+    """
+    def __init__(self, directory, max_bytes=256 * 2 ** 20):
+        """
+        params:
+        - directory (str): directory of cached results; created if it does not exist
+        - max_bytes (int): size bound of the cache
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def solve(self, solver, maze, **params):
+        """
+        params:
+        - solver: algorithm, e.g. value_iteration; a function defined at module level
+        - maze (Maze or CompactMaze): the maze to solve
+        - params: parameters of the solver, by name
+
+        return: result of solver(maze, **params), from the cache if it is there
+        """
+        key = self.key(solver, maze, params)
+
+        if key is None:
+            return solver(maze, **params)
+
+        history = params.get('history')
+        result = self.load(key, maze, history)
+
+        if result is not None:
+            self.num_hits += 1
+            return result
+
+        self.num_misses += 1
+        result = solver(maze, **params)
+        self.save(key, maze, result)
+
+        return result
+
+    def key(self, solver, maze, params):
+        """
+        returns: hex digest of everything that determines the result (str),
+            or None if the result cannot be cached
+        """
+        history = params.get('history')
+
+        if not hasattr(maze, 'grid') or \
+                type(history) not in (type(None), HistoryRecorder, MemoryHistory):
+            return None
+
+        grid = maze.grid if isinstance(maze.grid, np.ndarray) else encode_grid(maze.grid)
+
+        description = json.dumps(
+            {
+                'version': CACHE_VERSION,
+                'solver': solver.__module__ + '.' + solver.__qualname__,
+                'parameters': {
+                    name: repr(value)
+                    for name, value in params.items()
+                    if name not in IGNORED_PARAMETERS
+                },
+                'history': _describe_history(history),
+                'reward_mapping': sorted(maze.reward_mapping.items()),
+                'discount': maze.discount,
+                'stencil': [
+                    (action.name, moves)
+                    for action, moves in maze.stencil.items()
+                ],
+                'shape': grid.shape,
+            },
+            sort_keys=True,
+        )
+
+        digest = hashlib.sha256(description.encode())
+        digest.update(np.ascontiguousarray(grid, dtype=np.uint8).tobytes())
+
+        return digest.hexdigest()
+
+    def load(self, key, maze, history=None):
+        """
+        params:
+        - key (str): see key
+        - maze (Maze or CompactMaze): the maze that was solved
+        - history (HistoryRecorder): restored with the recorded utilities, if any;
+            defaults to None (off)
+
+        return: result, same as of the solver; None if it is not in the cache
+        """
+        file_path = self._file_path(key)
+
+        try:
+            with np.load(file_path) as arrays:
+                arrays = dict(arrays)
+        except (FileNotFoundError, ValueError, OSError):
+            return None  # not cached, or left incomplete
+
+        os.utime(file_path)  # most recently used
+
+        states = list(maze.states)
+        actions = list(maze.actions)
+
+        if history is None:
+            history = HistoryRecorder()
+
+        if 'history_iterations' in arrays:
+            history.restore(
+                list(map(tuple, arrays['history_states'].tolist())),
+                arrays['history_iterations'].tolist(),
+                arrays['history_rows'],
+            )
+
+        result = {
+            'utilities': dict(zip(states, arrays['utilities'].tolist())),
+            'optimal_policy': {
+                state: actions[action_index] if action_index >= 0 else None
+                for state, action_index in zip(states, arrays['optimal_policy'].tolist())
+            },
+            'num_iterations': int(arrays['num_iterations']),
+            'iteration_utilities': history.iteration_utilities(),
+            'history': history,
+        }
+
+        for name, value in arrays.items():
+            if name.startswith('extra_'):
+                result[name[len('extra_'):]] = value.item()
+
+        return result
+
+    def save(self, key, maze, result):
+        """
+        Stores a result, then removes least recently used results
+        until the cache is within its size bound.
+
+        params:
+        - key (str): see key
+        - maze (Maze or CompactMaze): the maze that was solved
+        - result (dict): result of the solver
+        """
+        states = list(maze.states)
+        action_indices = {action: index for index, action in enumerate(maze.actions)}
+
+        optimal_policy = result['optimal_policy']
+        arrays = {
+            'utilities': np.array(
+                [result['utilities'][state] for state in states],
+                dtype=float,
+            ),
+            'optimal_policy': np.array(
+                [action_indices.get(optimal_policy[state], -1) for state in states],
+                dtype=np.int8,
+            ),
+            'num_iterations': np.array(result['num_iterations']),
+        }
+
+        history = result.get('history')
+
+        if history is not None and history.iterations:
+            utilities = history.iteration_utilities()
+
+            arrays['history_states'] = np.array(history.states, dtype=np.int32).reshape(-1, 2)
+            arrays['history_iterations'] = np.array(history.iterations)
+            arrays['history_rows'] = np.stack(
+                [utilities[state] for state in history.states],
+                axis=1,
+            )
+
+        # e.g. num_backups of prioritized_sweeping
+        for name, value in result.items():
+            if name not in RESULT_KEYS and np.isscalar(value):
+                arrays['extra_' + name] = np.array(value)
+
+        # written under a temporary name first, so that a partial file is never read
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory,
+            suffix='.tmp',
+            delete=False,
+        ) as file:
+            np.savez(file, **arrays)
+
+        os.replace(file.name, self._file_path(key))
+        self._evict()
+
+    def clear(self):
+        """
+        Removes every cached result.
+        """
+        for file_path, _, _ in self._entries():
+            os.remove(file_path)
+
+    @property
+    def nbytes(self):
+        """
+        returns: total size of cached results, in bytes (int)
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def _file_path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _entries(self):
+        """
+        returns: [(file path, size, time of last use)] of every cached result
+        """
+        entries = []
+
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.npz'):
+                continue
+
+            file_path = os.path.join(self.directory, file_name)
+
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue  # removed by another process
+
+            entries.append((file_path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def _evict(self):
+        """
+        Removes least recently used results until the cache is within its size bound.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total_bytes = sum(size for _, size, _ in entries)
+
+        for file_path, size, _ in entries:
+            if total_bytes <= self.max_bytes:
+                break
+
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass  # removed by another process
+
+            total_bytes -= size
+
+
+def _describe_history(history):
+    """
+    returns: what a history recorder records (dict), as part of a key
+    """
+    if type(history) is not MemoryHistory:
+        return None
+
+    return {
+        'every': history.every,
+        'states': None if history.chosen_states is None else repr(list(history.chosen_states)),
+        'num_samples': history.num_samples,
+        'seed': history.seed,
+    }
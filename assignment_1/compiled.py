@@ -0,0 +1,332 @@
+"""
+Array representation of a Markov decision process.
+
+States and actions are mapped to integer indices, so that a Bellman backup
+over every state can be done with whole-array numpy operations
+instead of a Python loop over dicts.
+"""
+import numpy as np
+from scipy import sparse
+
+
+class CompiledMDP:
+    """
+    Integer-indexed form of a MarkovDecisionProcess.
+
+    With S states, A actions and at most K possible next states per action:
+    - states (list): state at each index
+    - state_indices (dict): maps each state to its index
+    - actions (list): action at each index
+    - next_states (np.ndarray): int array of shape (S, A, K);
+        index of each possible next state of taking action a at state s
+    - probabilities (np.ndarray): float array of shape (S, A, K);
+        probability of moving into the matching entry of next_states
+    - rewards (np.ndarray): float array of shape (S,)
+    - discount (float)
+    """
+    def __init__(
+        self,
+        states,
+        actions,
+        next_states,
+        probabilities,
+        rewards,
+        discount,
+    ):
+        self.states = states
+        self.actions = actions
+        self.next_states = next_states
+        self.probabilities = probabilities
+        self.rewards = rewards
+        self.discount = discount
+
+        # built on first use
+        self._state_indices = None
+        self._predecessors = None
+
+    @property
+    def num_states(self):
+        return len(self.states)
+
+    @property
+    def state_indices(self):
+        # built on first use, since states may be a lazy view of a very large maze
+        if self._state_indices is None:
+            self._state_indices = {
+                state: index
+                for index, state in enumerate(self.states)
+            }
+
+        return self._state_indices
+
+    def expected_utilities(self, utilities, out=None, work=None):
+        """
+        Implementation of ∑s′P(s′|s, a)U[s′], for every state and action at once
+
+        params:
+        - utilities (np.ndarray): utility of each state, shape (S,)
+        - out (np.ndarray): array of shape (S, A) to write into,
+            of the dtype of utilities; defaults to None (new array)
+        - work (tuple): scratch arrays (see work_buffers) that intermediates
+            are written into; defaults to None (new arrays)
+
+        return: np.ndarray of shape (S, A)
+        """
+        if work is None:
+            return (self.probabilities * utilities[self.next_states]).sum(axis=2, out=out)
+
+        products, = work
+
+        np.take(utilities, self.next_states, out=products, mode='clip')
+        np.multiply(self.probabilities, products, out=products)
+
+        return products.sum(axis=2, out=out)
+
+    def work_buffers(self, dtype=np.float64):
+        """
+        returns: scratch arrays for expected_utilities (tuple), so that sweeps
+            that call it again and again do not allocate intermediates each time
+        """
+        return (np.empty(self.probabilities.shape, dtype=dtype),)
+
+    def predecessors(self):
+        """
+        Reverse of the transition model, built on first use.
+
+        returns: scipy.sparse.csr_matrix of shape (S, S),
+            where row s′ holds max a∈A(s) P(s′|s, a) of every state s
+        """
+        if self._predecessors is None:
+            max_probabilities = None
+
+            for matrix in self.action_matrices():
+                max_probabilities = matrix if max_probabilities is None \
+                    else max_probabilities.maximum(matrix)
+
+            self._predecessors = max_probabilities.T.tocsr()
+
+        return self._predecessors
+
+    def transition_matrices(self):
+        """
+        returns: same as MarkovDecisionProcess.transition_matrices
+        """
+        return {
+            'states': list(self.states),
+            'actions': list(self.actions),
+            'transition_matrices': self.action_matrices(),
+            'rewards': self.rewards,
+            'state_indices': self.state_indices,
+        }
+
+    def action_matrices(self):
+        """
+        returns: [
+            scipy.sparse.csr_matrix of shape (S, S) for each action,
+                where row s holds P(s′|s, a) of every next state s′
+        ]
+        """
+        num_states = self.num_states
+        rows = np.repeat(np.arange(num_states), self.next_states.shape[2])
+        matrices = []
+
+        for action_index in range(len(self.actions)):
+            # possible next states that are the same are summed
+            matrix = sparse.csr_matrix(
+                (
+                    self.probabilities[:, action_index].ravel(),
+                    (rows, self.next_states[:, action_index].ravel()),
+                ),
+                shape=(num_states, num_states),
+            )
+            matrix.eliminate_zeros()  # unused slots
+            matrices.append(matrix)
+
+        return matrices
+
+    def to_state_dict(self, values):
+        """
+        params:
+        - values (np.ndarray): value of each state, shape (S,)
+
+        return: {
+            state: value (float)
+        }
+        """
+        return dict(zip(self.states, values.tolist()))
+
+    def to_policy_dict(self, action_indices):
+        """
+        params:
+        - action_indices (np.ndarray): index of action to take at each state, shape (S,)
+
+        return: {
+            state: action
+        }
+        """
+        return {
+            state: self.actions[action_index]
+            for state, action_index in zip(self.states, action_indices.tolist())
+        }
+
+
+class StencilMDP(CompiledMDP):
+    """
+    CompiledMDP of a grid where each action takes the same moves (dx, dy),
+    with the same probabilities, at every state: a stencil
+    (e.g. maze.ACTION_MOVES), of M distinct moves.
+
+    The successor of each move of every state is formed once, by shifting the grid
+    (padded with walls) by the move, with moves into walls / out of bounds masked
+    to the state itself (bounce). So ∑s′P(s′|s, a)U[s′] of every state is
+    1 gather of U per move, then a (M → A) product, whatever the stencil:
+    - moves (list): (dx, dy) of each move, sorted
+    - move_successors (np.ndarray): int array of shape (M, S);
+        index of actual next state of each move of each state
+    - move_probabilities (np.ndarray): float array of shape (A, M);
+        probability of each action taking each move
+
+    next_states and probabilities (S, A, K) are formed from them on first use,
+    for algorithms that gather the transitions of only some states;
+    unused slots (actions of fewer than K moves) take move 0 with probability 0.
+    """
+    def __init__(self, states, stencil, move_successors, rewards, discount):
+        """
+        params:
+        - states (list): state at each index
+        - stencil (dict): maps each action to ((dx, dy, probability), ...) of its moves
+        - move_successors (np.ndarray): see above, for moves in sorted order
+        - rewards (np.ndarray): float array of shape (S,)
+        - discount (float)
+        """
+        self.moves = sorted({(dx, dy) for moves in stencil.values() for dx, dy, _ in moves})
+        self.move_successors = move_successors
+
+        move_indices = {move: index for index, move in enumerate(self.moves)}
+        max_num_moves = max(len(moves) for moves in stencil.values())
+
+        # move and probability of each slot of each action, shape (A, K)
+        self._slot_moves = np.zeros((len(stencil), max_num_moves), dtype=np.intp)
+        self._slot_probabilities = np.zeros((len(stencil), max_num_moves))
+        self.move_probabilities = np.zeros((len(stencil), len(self.moves)))
+
+        for action_index, moves in enumerate(stencil.values()):
+            for k, (dx, dy, probability) in enumerate(moves):
+                self._slot_moves[action_index, k] = move_indices[(dx, dy)]
+                self._slot_probabilities[action_index, k] = probability
+                self.move_probabilities[action_index, move_indices[(dx, dy)]] = probability
+
+        super().__init__(states, list(stencil), None, None, rewards, discount)
+
+    @property
+    def next_states(self):
+        if self._next_states is None:
+            self._next_states = self.move_successors.T[:, self._slot_moves]
+
+        return self._next_states
+
+    @next_states.setter
+    def next_states(self, next_states):
+        self._next_states = next_states
+
+    @property
+    def probabilities(self):
+        if self._probabilities is None:
+            self._probabilities = np.broadcast_to(
+                self._slot_probabilities,
+                (self.num_states,) + self._slot_probabilities.shape,
+            )
+
+        return self._probabilities
+
+    @probabilities.setter
+    def probabilities(self, probabilities):
+        self._probabilities = probabilities
+
+    def expected_utilities(self, utilities, out=None, work=None):
+        """
+        Same as CompiledMDP.expected_utilities, from U[s′] of each move
+
+        params: same as CompiledMDP.expected_utilities
+
+        return: np.ndarray of shape (S, A)
+        """
+        if work is None:
+            move_utilities = utilities[self.move_successors]  # shape (M, S)
+        else:
+            move_utilities, indices = work
+
+            # 1 move at a time, through a buffer of indices of the type np.take needs,
+            # so that indices of every move are not converted at once
+            for move_index, successors in enumerate(self.move_successors):
+                np.copyto(indices, successors)
+                np.take(utilities, indices, out=move_utilities[move_index], mode='clip')
+
+        move_probabilities = self.move_probabilities.astype(move_utilities.dtype, copy=False)
+
+        return np.dot(move_utilities.T, move_probabilities.T, out=out)
+
+    def work_buffers(self, dtype=np.float64):
+        """
+        returns: scratch arrays for expected_utilities: (
+            U[s′] of each move, shape (M, S),
+            index of successor of each state for 1 move, shape (S,),
+        )
+        """
+        return (
+            np.empty(self.move_successors.shape, dtype=dtype),
+            np.empty(self.num_states, dtype=np.intp),
+        )
+
+
+def compile_mdp(mdp):
+    """
+    Compiles any MarkovDecisionProcess into a CompiledMDP,
+    by walking through its transition table once.
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to compile
+
+    return: CompiledMDP
+    """
+    states = list(mdp.states)
+    actions = list(mdp.actions)
+    state_indices = {state: index for index, state in enumerate(states)}
+    transition_table = mdp.transition_table
+
+    max_num_next_states = max(
+        (
+            len(transition_table[state][action])
+            for state in states
+            for action in actions
+        ),
+        default=1,
+    )
+
+    shape = (len(states), len(actions), max_num_next_states)
+
+    # unused slots point back to the state itself with probability 0
+    next_states = np.repeat(
+        np.arange(len(states), dtype=np.intp),
+        len(actions) * max_num_next_states
+    ).reshape(shape)
+    probabilities = np.zeros(shape)
+
+    for state_index, state in enumerate(states):
+        for action_index, action in enumerate(actions):
+            next_state_transitions = transition_table[state][action]
+
+            for k, (next_state, probability) in enumerate(next_state_transitions):
+                next_states[state_index, action_index, k] = state_indices[next_state]
+                probabilities[state_index, action_index, k] = probability
+
+    rewards = np.array([mdp.reward_function(state) for state in states], dtype=float)
+
+    return CompiledMDP(
+        states,
+        actions,
+        next_states,
+        probabilities,
+        rewards,
+        mdp.discount,
+    )
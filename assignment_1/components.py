@@ -0,0 +1,317 @@
+"""
+Value iteration on an MDP split into strongly connected components (SCCs)
+of its graph of states (an edge s → s′ wherever P(s′|s, a) > 0 for some action a).
+
+Components are found with (iterative) Tarjan's algorithm, which yields them
+in reverse topological order: every edge out of a component goes into one found before it.
+So components are solved in that order, each reading the final utilities
+of the components it can move into, and each swept only until its own δ < ϵ(1−γ)/γ.
+
+Components that cannot reach each other (the same level; see _get_component_levels)
+are swept together, in 1 array operation per sweep,
+and each leaves the sweep as soon as it has converged.
+"""
+import time
+
+import numpy as np
+from scipy import sparse
+
+from assignment_1.base import MarkovDecisionProcess
+from assignment_1.compiled import CompiledMDP
+from assignment_1.history import HistoryRecorder
+from assignment_1.observers import IterationInfo, notify
+
+
+def component_value_iteration(
+    mdp: MarkovDecisionProcess,
+    max_error=1,
+    verbose=False,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+):
+    """
+    Same as value_iteration (Jacobi sweeps), but solved 1 level of components at a time.
+
+    The Bellman residual of every state is below ϵ(1−γ)/γ at the end,
+    since each component stops at that residual, with utilities that it reads
+    from other components that do not change afterwards;
+    so the usual bound on the error of any state holds.
+
+    params:
+    - mdp (MarkovDecisionProcess): an MDP with
+        states S,
+        actions A(s),
+        transition model P(s′|s, a),
+        rewards R(s),
+        discount γ
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: same as value_iteration; defaults to None (not observed)
+
+    return: same as value_iteration, where each iteration is a sweep of
+        every component of a level that has not converged yet, and with
+        'num_backups': total number of backups performed (int),
+        'num_components': number of strongly connected components (int)
+    """
+    compiled = mdp.compile()
+    threshold = max_error * (1 - compiled.discount) / compiled.discount
+
+    graph = get_state_graph(compiled)
+    components, num_components = strongly_connected_components(graph)
+    state_levels = _get_component_levels(graph, components, num_components)[components]
+
+    # U, vector of utilities for states in S, initially zero
+    utilities = np.zeros(compiled.num_states)
+    optimal_policy = np.full(compiled.num_states, -1, dtype=np.intp)  # no action yet
+
+    if history is None:
+        history = HistoryRecorder()
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(compiled.states)
+    history.record(0, utilities)
+
+    num_iterations, num_backups = 0, 0
+    is_stopped = False
+
+    for level in range(state_levels.max(initial=-1) + 1):
+        # states of this level, grouped by component
+        active_states = np.flatnonzero(state_levels == level)
+        active_states = active_states[np.argsort(components[active_states], kind='stable')]
+
+        # gathered once, then again only when a component converges
+        next_states, probabilities, rewards, component_starts = \
+            _gather_active(compiled, components, active_states)
+
+        while active_states.size > 0 and not is_stopped:
+            sweep_start_time = time.perf_counter()
+
+            # U′[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′], for every active state
+            expected_utilities = (probabilities * utilities[next_states]).sum(axis=2)
+            new_utilities = rewards + compiled.discount * expected_utilities.max(axis=1)
+
+            new_policy = expected_utilities.argmax(axis=1)
+
+            if on_iteration is not None:
+                num_policy_changes = np.count_nonzero(optimal_policy[active_states] != new_policy)
+
+            optimal_policy[active_states] = new_policy
+
+            # δ ← max |U′[s]−U[s]|, of each component
+            utility_changes = np.abs(new_utilities - utilities[active_states])
+            component_changes = np.maximum.reduceat(utility_changes, component_starts)
+
+            # until δ < ϵ(1−γ)/γ; U of a converged component is kept as is,
+            # like value_iteration returns U rather than U′
+            is_unconverged = np.repeat(
+                component_changes >= threshold,
+                np.diff(np.append(component_starts, active_states.size)),
+            )
+            utilities[active_states[is_unconverged]] = new_utilities[is_unconverged]
+
+            num_iterations += 1
+            num_backups += active_states.size
+
+            if verbose:
+                print(
+                    'iteration:', num_iterations,
+                    '-level:', level,
+                    '-states backed up:', active_states.size,
+                    '-maximum change in the utility of any state:',
+                    '{:.6f}'.format(utility_changes.max()),
+                )
+
+            history.record(num_iterations, utilities)
+
+            if on_iteration is not None and notify(on_iteration, IterationInfo(
+                num_iterations,
+                float(utility_changes.max()),
+                int(num_policy_changes),
+                time.perf_counter() - sweep_start_time,
+                int(active_states.size),
+            )):
+                is_stopped = True
+
+            if not is_unconverged.all():
+                active_states = active_states[is_unconverged]
+                next_states, probabilities, rewards, component_starts = \
+                    _gather_active(compiled, components, active_states)
+
+    history.finish()
+
+    return {
+        'utilities': compiled.to_state_dict(utilities),
+        'optimal_policy': compiled.to_policy_dict(optimal_policy),
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+        'num_backups': num_backups,
+        'num_components': num_components,
+    }
+
+
+def strongly_connected_components(graph):
+    """
+    Tarjan's algorithm, with an explicit stack instead of recursion,
+    so that components of millions of states do not overflow the call stack.
+
+    params:
+    - graph (scipy.sparse.csr_matrix): shape (S, S), with an entry at (s, s′)
+        for each edge s → s′
+
+    return: (
+        component of each state, numbered in reverse topological order,
+            i.e. every edge s → s′ has component[s′] <= component[s] (np.ndarray),
+        number of components (int),
+    )
+    """
+    num_states = graph.shape[0]
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+
+    # order each state is visited in, and lowest of those reachable from it
+    visit_order, lowest_reachable = [-1] * num_states, [0] * num_states
+    on_stack = [False] * num_states
+    component = [-1] * num_states
+
+    stack = []
+    num_visited, num_components = 0, 0
+
+    for root in range(num_states):
+        if visit_order[root] >= 0:
+            continue
+
+        visit_order[root] = lowest_reachable[root] = num_visited
+        num_visited += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        # (state, position of its next edge in indices), in place of recursive calls
+        call_stack = [(root, indptr[root])]
+
+        while call_stack:
+            state, edge = call_stack[-1]
+            end = indptr[state + 1]
+
+            while edge < end:
+                next_state = indices[edge]
+                edge += 1
+
+                if visit_order[next_state] < 0:
+                    # visit next_state, then come back to the rest of the edges of state
+                    call_stack[-1] = (state, edge)
+
+                    visit_order[next_state] = lowest_reachable[next_state] = num_visited
+                    num_visited += 1
+                    stack.append(next_state)
+                    on_stack[next_state] = True
+
+                    call_stack.append((next_state, indptr[next_state]))
+                    break
+                elif on_stack[next_state]:
+                    lowest_reachable[state] = min(
+                        lowest_reachable[state],
+                        visit_order[next_state],
+                    )
+            else:
+                # every edge of state is done
+                call_stack.pop()
+
+                if call_stack:
+                    caller = call_stack[-1][0]
+                    lowest_reachable[caller] = min(
+                        lowest_reachable[caller],
+                        lowest_reachable[state],
+                    )
+
+                # state is the root of a component: pop the component off the stack
+                if lowest_reachable[state] == visit_order[state]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = num_components
+
+                        if member == state:
+                            break
+
+                    num_components += 1
+
+    return np.array(component, dtype=np.intp), num_components
+
+
+def get_state_graph(compiled: CompiledMDP):
+    """
+    returns: scipy.sparse.csr_matrix of shape (S, S),
+        with an entry at (s, s′) wherever P(s′|s, a) > 0 for some action a
+    """
+    num_states = compiled.num_states
+    is_edge = compiled.probabilities.reshape(num_states, -1) > 0
+
+    graph = sparse.csr_matrix(
+        (
+            np.ones(np.count_nonzero(is_edge), dtype=np.int8),
+            (
+                np.nonzero(is_edge)[0],
+                compiled.next_states.reshape(num_states, -1)[is_edge],
+            ),
+        ),
+        shape=(num_states, num_states),
+    )
+    graph.sum_duplicates()
+
+    return graph
+
+
+def _gather_active(compiled: CompiledMDP, components, active_states):
+    """
+    params:
+    - compiled (CompiledMDP): the MDP
+    - components (np.ndarray): component of each state
+    - active_states (np.ndarray): indices of states to sweep, grouped by component
+
+    return: (
+        next_states, probabilities, rewards of active states (np.ndarray),
+        index into active_states of the 1st state of each component (np.ndarray),
+    )
+    """
+    active_components = components[active_states]
+
+    return (
+        compiled.next_states[active_states],
+        compiled.probabilities[active_states],
+        compiled.rewards[active_states],
+        np.flatnonzero(
+            np.concatenate(([True], active_components[1:] != active_components[:-1]))
+        ),
+    )
+
+
+def _get_component_levels(graph, components, num_components):
+    """
+    params:
+    - graph (scipy.sparse.csr_matrix): see get_state_graph
+    - components (np.ndarray): component of each state (see strongly_connected_components)
+    - num_components (int)
+
+    return: level of each component (np.ndarray): 0 if it cannot move into another
+        component, else 1 more than the highest level of the components it can move into
+    """
+    graph = graph.tocoo()
+
+    source_components, target_components = components[graph.row], components[graph.col]
+    is_between = source_components != target_components
+
+    # edges between components, sorted by source; targets always come before sources
+    order = np.argsort(source_components[is_between], kind='stable')
+    edges = zip(
+        source_components[is_between][order].tolist(),
+        target_components[is_between][order].tolist(),
+    )
+
+    levels = [0] * num_components
+
+    for source_component, target_component in edges:
+        levels[source_component] = max(levels[source_component], levels[target_component] + 1)
+
+    return np.array(levels, dtype=np.intp)
@@ -33,3 +33,11 @@ MAX_ERROR = 20
 
 # for policy iteration
 NUM_POLICY_EVALUATION = 100
+
+# for generating the same bonus maze on every run
+BONUS_MAZE_SEED = 4046
+BONUS_GRID_LENGTH = 100
+
+# for caching results of the algorithms between runs
+CACHE_DIR_PATH = 'assignment_1/.cache/'
+CACHE_MAX_BYTES = 256 * 2 ** 20  # 256 MiB
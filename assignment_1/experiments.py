@@ -0,0 +1,218 @@
+"""
+Experiments of assignment 1, declared as data,
+and run by a pool of processes that render plots without a display.
+
+Each experiment builds its own maze, so experiments are independent of each other.
+"""
+import multiprocessing
+
+import matplotlib
+
+from assignment_1.algorithms import policy_iteration, value_iteration
+from assignment_1.cache import ResultCache
+from assignment_1.config import *
+from assignment_1.export import write_result
+from assignment_1.grid import generate_grid
+from assignment_1.history import MemoryHistory
+from assignment_1.maze import Maze, decode_grid
+from assignment_1.plot import plot_utility_vs_iteration
+from assignment_1.profiling import Profiler
+
+# solvers that experiments can name
+SOLVERS = {
+    'value_iteration': value_iteration,
+    'policy_iteration': policy_iteration,
+}
+
+# experiments run by solve_MDP, in order of their results
+EXPERIMENTS = [
+    {
+        'name': 'value iteration',
+        'maze': 'given',  # 'given' (GRID) or 'bonus' (generated with BONUS_MAZE_SEED)
+        'discount': DISCOUNT_FACTOR,
+        'solver': 'value_iteration',
+        'parameters': {'max_error': MAX_ERROR},
+        'result_file_name': 'value_iteration_result.txt',
+        'plot_file_name': 'value_iteration_utilities.png',
+    },
+    # For approximation of reference utilities given in instructions,
+    # use discount factor of 0.95 and maximum error threshold of 1.4.
+    # Values obtained through trial and error.
+    {
+        'name': 'reference value iteration',
+        'maze': 'given',
+        'discount': REFERENCE_DISCOUNT_FACTOR,
+        'solver': 'value_iteration',
+        'parameters': {'max_error': REFERENCE_MAX_ERROR},
+        'result_file_name': 'approximate_reference_utilities_result.txt',
+        'plot_file_name': 'approximate_reference_utilities.png',
+    },
+    {
+        'name': 'policy iteration',
+        'maze': 'given',
+        'discount': DISCOUNT_FACTOR,
+        'solver': 'policy_iteration',
+        'parameters': {'num_policy_evaluation': 100},
+        'result_file_name': 'policy_iteration_result.txt',
+        'plot_file_name': 'policy_iteration_utilities.png',
+    },
+    {
+        'name': 'bonus value iteration',
+        'maze': 'bonus',
+        'discount': DISCOUNT_FACTOR,
+        'solver': 'value_iteration',
+        'parameters': {'max_error': MAX_ERROR, 'verbose': True},
+        'result_file_name': 'bonus_value_iteration_result.txt',
+        'plot_file_name': 'bonus_value_iteration_utilities.png',
+    },
+    {
+        'name': 'bonus policy iteration',
+        'maze': 'bonus',
+        'discount': DISCOUNT_FACTOR,
+        'solver': 'policy_iteration',
+        'parameters': {'num_policy_evaluation': NUM_POLICY_EVALUATION, 'verbose': True},
+        'result_file_name': 'bonus_policy_iteration_result.txt',
+        'plot_file_name': 'bonus_policy_iteration_utilities.png',
+    },
+]
+
+
+def run_experiments(
+    experiments=None,
+    num_workers=None,
+    profile=False,
+    use_cache=True,
+    quiet=False,
+    result_formats=('txt',),
+):
+    """
+    params:
+    - experiments (list): experiments to run (see EXPERIMENTS);
+        defaults to None (EXPERIMENTS)
+    - num_workers (int): number of processes; 1 to run every experiment in this process;
+        defaults to None (number of CPUs, up to the number of experiments)
+    - profile (bool): whether to trace peak memory of each phase as well as its time
+    - use_cache (bool): whether to reuse results cached by earlier runs
+    - quiet (bool): whether to print the number of iterations of each experiment only,
+        without the progress of its solver
+    - result_formats (tuple): formats to save results as (see export.EXPORT_FORMATS)
+
+    return: [summary of each experiment (dict); see run_experiment], in order of experiments
+    """
+    experiments = EXPERIMENTS if experiments is None else experiments
+
+    if num_workers is None:
+        num_workers = min(multiprocessing.cpu_count(), len(experiments))
+
+    args = [
+        (experiment, profile, use_cache, quiet, result_formats)
+        for experiment in experiments
+    ]
+
+    if num_workers <= 1:
+        _use_headless_backend()
+        return [run_experiment(*experiment_args) for experiment_args in args]
+
+    # fresh processes, instead of forks of this one and its plotting state
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(num_workers, initializer=_use_headless_backend) as pool:
+        return pool.starmap(run_experiment, args)
+
+
+def run_experiment(
+    experiment,
+    profile=False,
+    use_cache=True,
+    quiet=False,
+    result_formats=('txt',),
+):
+    """
+    Builds the maze of an experiment, solves it, then saves its result and plot.
+
+    params:
+    - experiment (dict): see EXPERIMENTS
+    - profile (bool): whether to trace peak memory of each phase as well as its time
+    - use_cache (bool): whether to reuse results cached by earlier runs
+    - quiet (bool): whether to print the number of iterations only, instead of the result,
+        and of the progress of the solver (its verbose parameter)
+    - result_formats (tuple): formats to save result as (see export.EXPORT_FORMATS)
+
+    return: {
+        'name': name of experiment (str),
+        'num_iterations': (int),
+        'phases': [time of each phase (dict); see Profiler.report],
+    }
+    """
+    name = experiment['name']
+    profiler = Profiler(trace_memory=profile)
+
+    with profiler.phase(name + ': build maze'):
+        maze = Maze(
+            grid=_get_grid(experiment['maze']),
+            reward_mapping=REWARD_MAPPING,
+            starting_point=STARTING_POINT,
+            discount_factor=experiment['discount']
+        )
+
+    with profiler.phase(name + ': solve'):
+        solver = SOLVERS[experiment['solver']]
+        parameters = dict(experiment['parameters'], history=MemoryHistory())
+
+        if quiet:
+            parameters['verbose'] = False
+
+        if use_cache:
+            result = ResultCache(CACHE_DIR_PATH, CACHE_MAX_BYTES).solve(
+                solver,
+                maze,
+                **parameters
+            )
+        else:
+            result = solver(maze, **parameters)
+
+    with profiler.phase(name + ': write result'):
+        write_result(
+            maze,
+            result,
+            save_file_name=RESULTS_DIR_PATH + experiment['result_file_name'],
+            formats=result_formats,
+            quiet=quiet
+        )
+
+    with profiler.phase(name + ': plot'):
+        plot_utility_vs_iteration(
+            result['iteration_utilities'],
+            save_file_name=experiment['plot_file_name'],
+            show=False
+        )
+
+    profiler.close()
+
+    return {
+        'name': name,
+        'num_iterations': result['num_iterations'],
+        'phases': profiler.phases,
+    }
+
+
+def _get_grid(maze_name):
+    """
+    params:
+    - maze_name (str): 'given' or 'bonus'
+
+    return: 2D array (list of list) of colours
+    """
+    if maze_name == 'given':
+        return GRID
+    elif maze_name == 'bonus':
+        return decode_grid(generate_grid(BONUS_GRID_LENGTH, seed=BONUS_MAZE_SEED))
+
+    raise ValueError('unknown maze: ' + str(maze_name))
+
+
+def _use_headless_backend():
+    """
+    Renders plots into files only, so that nothing waits for a window to be closed.
+    """
+    matplotlib.use('Agg')
@@ -0,0 +1,215 @@
+"""
+Export of results of the algorithms on a maze:
+- 'txt': number of iterations, utility of each state, and grid of optimal policy
+    (same layout as printed), written in large buffered chunks
+- 'npz': positions, utilities and optimal policy of every state as arrays
+- 'csv': 1 row per state (x, y, utility, action), written in large buffered chunks
+
+Results are turned into arrays once (see result_arrays),
+so that every format is formed from arrays instead of 1 write per state.
+"""
+import os
+import sys
+
+import numpy as np
+
+from assignment_1.maze import CELL_TYPES, WALL, MazeAction
+
+EXPORT_FORMATS = ('txt', 'npz', 'csv')
+
+# symbol of the action to take at each state in a grid of optimal policy
+ACTION_SYMBOLS = {
+    MazeAction.MOVE_UP: '∧',
+    MazeAction.MOVE_DOWN: 'v',
+    MazeAction.MOVE_LEFT: '<',
+    MazeAction.MOVE_RIGHT: '>',
+    MazeAction.MOVE_UP_LEFT: '↖',
+    MazeAction.MOVE_UP_RIGHT: '↗',
+    MazeAction.MOVE_DOWN_LEFT: '↙',
+    MazeAction.MOVE_DOWN_RIGHT: '↘',
+    MazeAction.STAY: 'o',
+}
+NO_ACTION_SYMBOL = '.'  # e.g. terminal states
+
+# number of states formatted into text at a time, then written at once
+CHUNK_STATES = 2 ** 16
+
+# size of buffer of files written as text
+TEXT_BUFFER_BYTES = 2 ** 20
+
+
+def write_result(maze, result, save_file_name=None, formats=('txt',), quiet=False):
+    """
+    params:
+    - maze (Maze or CompactMaze)
+    - result (dict): result of solving a maze
+    - save_file_name (str): path of file to save result as, e.g. 'results/value_iteration.txt';
+        its extension is replaced by that of each format; defaults to None (not saved)
+    - formats (tuple): formats to save result as, from EXPORT_FORMATS; defaults to ('txt',)
+    - quiet (bool): whether to print the number of iterations only,
+        instead of the whole result; defaults to False
+    """
+    for export_format in formats:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError('unknown format: ' + str(export_format))
+
+    arrays = result_arrays(maze, result)
+    num_iterations_line = 'number of iterations required: ' + str(result['num_iterations'])
+
+    if quiet:
+        print(num_iterations_line)
+    else:
+        _write_text(sys.stdout, arrays, num_iterations_line, row_breaks=True)
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+    if save_file_name is None:
+        return
+
+    file_path_root = os.path.splitext(save_file_name)[0]
+
+    if 'txt' in formats:
+        with _open_text(file_path_root + '.txt') as file:
+            _write_text(file, arrays, num_iterations_line)
+
+    if 'npz' in formats:
+        np.savez(file_path_root + '.npz', **arrays)
+
+    if 'csv' in formats:
+        with _open_text(file_path_root + '.csv') as file:
+            _write_csv(file, arrays)
+
+
+def result_arrays(maze, result):
+    """
+    params:
+    - maze (Maze or CompactMaze)
+    - result (dict): result of solving a maze
+
+    return: {
+        'shape': (number of rows, number of columns) of grid (np.ndarray),
+        'walls': whether each cell is a wall, shape of grid (np.ndarray),
+        'positions': (x, y) position of each state, shape (S, 2) (np.ndarray),
+        'utilities': utility of each state, shape (S,) (np.ndarray),
+        'optimal_policy': index into actions of action to take at each state,
+            -1 for no action, shape (S,) (np.ndarray),
+        'actions': name of each action, shape (A,) (np.ndarray),
+        'num_iterations': (np.ndarray),
+    }, in order of states of maze
+    """
+    if isinstance(maze.grid, np.ndarray):
+        walls = maze.grid == WALL
+    else:
+        walls = np.asarray(maze.grid) == CELL_TYPES[WALL]
+
+    if hasattr(maze, 'positions'):
+        positions = maze.positions
+    else:
+        positions = np.array(list(maze.states), dtype=np.int32).reshape(-1, 2)
+
+    states = list(maze.states)
+    utilities, optimal_policy = result['utilities'], result['optimal_policy']
+    action_indices = {action: index for index, action in enumerate(maze.actions)}
+
+    return {
+        'shape': np.array(walls.shape),
+        'walls': walls,
+        'positions': positions,
+        'utilities': np.fromiter(
+            (utilities[state] for state in states),
+            dtype=float,
+            count=len(states),
+        ),
+        'optimal_policy': np.fromiter(
+            (action_indices.get(optimal_policy[state], -1) for state in states),
+            dtype=np.int8,
+            count=len(states),
+        ),
+        'actions': np.array([action.name for action in maze.actions]),
+        'num_iterations': np.array(result['num_iterations']),
+    }
+
+
+def render_policy_grid(arrays):
+    """
+    params:
+    - arrays (dict): see result_arrays
+
+    return: symbol of each cell (np.ndarray of str), shape of grid;
+        'w' for walls, else symbol of action to take (see ACTION_SYMBOLS)
+    """
+    symbols = np.array(
+        [ACTION_SYMBOLS[MazeAction[name]] for name in arrays['actions'].tolist()]
+        + [NO_ACTION_SYMBOL]
+    )
+
+    policy_grid = np.full(arrays['walls'].shape, CELL_TYPES[WALL])
+    positions = arrays['positions']
+
+    # -1 (no action) picks the last symbol
+    policy_grid[positions[:, 0], positions[:, 1]] = symbols[arrays['optimal_policy']]
+
+    return policy_grid
+
+
+def _open_text(file_path):
+    return open(file_path, 'w', buffering=TEXT_BUFFER_BYTES, encoding='utf-8')
+
+
+def _write_text(file, arrays, num_iterations_line, row_breaks=False):
+    """
+    Writes the result in the same layout as printed, 1 chunk of states at a time.
+
+    params:
+    - file: text file (or sys.stdout) to write to
+    - arrays (dict): see result_arrays
+    - num_iterations_line (str)
+    - row_breaks (bool): whether to write an empty line before the 1st state of each row
+    """
+    file.write(num_iterations_line + '\n')
+    file.write('---utility for each state (row, column)---\n')
+
+    positions, utilities = arrays['positions'], arrays['utilities']
+
+    for start in range(0, len(utilities), CHUNK_STATES):
+        end = start + CHUNK_STATES
+
+        file.write(''.join([
+            ('\n' if row_breaks and y == 0 else '')
+            + '({}, {}) - utility: {:.3f}\n'.format(x, y, utility)
+            for (x, y), utility in zip(
+                positions[start:end].tolist(),
+                utilities[start:end].tolist(),
+            )
+        ]))
+
+    file.write('---optimal policy grid (w = wall)---\n')
+
+    # 1 row of the grid per line, like pprint of a list of rows that each fit in a line
+    rows = [str(row) for row in render_policy_grid(arrays).tolist()]
+    file.write('[' + ',\n '.join(rows) + ']\n')
+
+
+def _write_csv(file, arrays):
+    """
+    params:
+    - file: text file to write to
+    - arrays (dict): see result_arrays
+    """
+    action_names = arrays['actions'].tolist() + ['']
+    positions, utilities = arrays['positions'], arrays['utilities']
+    optimal_policy = arrays['optimal_policy']
+
+    file.write('x,y,utility,action\n')
+
+    for start in range(0, len(utilities), CHUNK_STATES):
+        end = start + CHUNK_STATES
+
+        file.write(''.join([
+            '{},{},{!r},{}\n'.format(x, y, utility, action_names[action_index])
+            for (x, y), utility, action_index in zip(
+                positions[start:end].tolist(),
+                utilities[start:end].tolist(),
+                optimal_policy[start:end].tolist(),
+            )
+        ]))
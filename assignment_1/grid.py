@@ -1,6 +1,20 @@
-import random
-import pprint
+"""
+Generation of random grids, and a binary file format for grids.
 
+binary grid file (little-endian):
+- header (16 bytes): b'MAZE', format version (uint8), 3 bytes of padding,
+    width (uint32), height (uint32)
+- cells (width x height bytes): uint8 index into CELL_TYPES of each cell, row by row
+"""
+import struct
+
+import numpy as np
+
+from assignment_1.maze import CELL_TYPES, decode_grid
+
+GRID_FILE_MAGIC = b'MAZE'
+GRID_FILE_VERSION = 1
+GRID_FILE_HEADER = struct.Struct('<4sB3xII')
 
 # Based on maze given, ~0.5 (16 out of 36 squares) of the maze is not white space.
 # Among non-white spaces (16 squares), roughly 
@@ -8,12 +22,21 @@ import pprint
 # ~1/3 are brown squares (5 brown),
 # ~1/3 are green squares (6 green)
 # Therefore, try to generate maze with roughly same distribution.
-def generate_maze(grid_length: int):
+CELL_TYPE_PROBABILITIES = {
+    'w': 0.5 / 3,  # wall
+    'b': 0.5 / 3,  # brown
+    'g': 0.5 / 3,  # green
+    ' ': 0.5,  # white
+}
+
+
+def generate_maze(grid_length: int, seed=None):
     """
     Generates a maze as a square grid that has size of (grid_length x grid_length).
 
     params:
     - grid_length (int): length of the grid
+    - seed (int): seed of the random generator; defaults to None (not reproducible)
 
     return:
     - 2D array (list of list): [
@@ -22,22 +45,118 @@ def generate_maze(grid_length: int):
         [' ', ..., ' '],
     ]
     """
-    random.seed()
-    grid = []
-
-    for row in range(grid_length):
-        grid.append([])
-        
-        for _ in range(grid_length):  # _ is column; column value not used
-            colour_number = random.random()
-
-            if colour_number < 0.5 / 3:
-                grid[row].append('w')  # wall
-            elif colour_number < 0.5 * 2 / 3:
-                grid[row].append('b')  # brown
-            elif colour_number < 0.5:
-                grid[row].append('g')  # green
-            else:
-                grid[row].append(' ')  # white
-
-    return grid
+    return decode_grid(generate_grid(grid_length, seed=seed))
+
+
+def generate_grid(
+    width: int,
+    height: int=None,
+    seed=None,
+    probabilities: dict=None,
+    chunk_rows: int=1024,
+):
+    """
+    Same as generate_maze, but as a uint8 array of indices into CELL_TYPES.
+
+    params: same as generate_grid_chunks
+
+    return: uint8 np.ndarray of shape (width, height)
+    """
+    return np.concatenate(
+        list(generate_grid_chunks(width, height, seed, probabilities, chunk_rows)),
+        axis=0,
+    )
+
+
+def generate_grid_chunks(
+    width: int,
+    height: int=None,
+    seed=None,
+    probabilities: dict=None,
+    chunk_rows: int=1024,
+):
+    """
+    Generates a grid a chunk of rows at a time, so that huge grids can be written to disk
+    without being held in memory. The grid depends on the seed only, not on chunk_rows.
+
+    params:
+    - width (int): number of rows
+    - height (int): number of columns; defaults to None (same as width)
+    - seed (int): seed of the random generator; defaults to None (not reproducible)
+    - probabilities (dict): maps colour to probability of each cell being of that colour;
+        defaults to None (CELL_TYPE_PROBABILITIES)
+    - chunk_rows (int): number of rows in each chunk
+
+    return: generator of uint8 np.ndarray of shape (rows in chunk, height)
+    """
+    if height is None:
+        height = width
+
+    if probabilities is None:
+        probabilities = CELL_TYPE_PROBABILITIES
+
+    cell_types = np.array(
+        [CELL_TYPES.index(colour) for colour in probabilities],
+        dtype=np.uint8,
+    )
+    cumulative_probabilities = np.cumsum(list(probabilities.values()))
+    cumulative_probabilities /= cumulative_probabilities[-1]
+
+    generator = np.random.default_rng(seed)
+
+    for row_start in range(0, width, chunk_rows):
+        num_rows = min(chunk_rows, width - row_start)
+        colour_numbers = generator.random((num_rows, height))
+
+        yield cell_types[np.searchsorted(cumulative_probabilities, colour_numbers, side='right')]
+
+
+def save_grid(file_path, grid):
+    """
+    params:
+    - file_path (str): binary grid file to write
+    - grid: uint8 np.ndarray of indices into CELL_TYPES,
+        or iterable of such arrays, each a chunk of rows (e.g. from generate_grid_chunks)
+    """
+    chunks = [grid] if isinstance(grid, np.ndarray) else grid
+    width, height = 0, 0
+
+    with open(file_path, 'wb') as file:
+        file.write(GRID_FILE_HEADER.pack(GRID_FILE_MAGIC, GRID_FILE_VERSION, 0, 0))
+
+        for chunk in chunks:
+            width += chunk.shape[0]
+            height = chunk.shape[1]
+            file.write(np.ascontiguousarray(chunk, dtype=np.uint8).tobytes())
+
+        # width is known only after the last chunk
+        file.seek(0)
+        file.write(GRID_FILE_HEADER.pack(GRID_FILE_MAGIC, GRID_FILE_VERSION, width, height))
+
+
+def load_grid(file_path, mmap=True):
+    """
+    params:
+    - file_path (str): binary grid file written by save_grid
+    - mmap (bool): memory-map the cells instead of reading them into memory
+
+    return: uint8 np.ndarray of shape (width, height), e.g. for CompactMaze
+    """
+    with open(file_path, 'rb') as file:
+        magic, version, width, height = GRID_FILE_HEADER.unpack(
+            file.read(GRID_FILE_HEADER.size)
+        )
+
+        if magic != GRID_FILE_MAGIC or version != GRID_FILE_VERSION:
+            raise ValueError('not a grid file (version ' + str(GRID_FILE_VERSION) + '): ' + file_path)
+
+        if not mmap:
+            return np.fromfile(file, dtype=np.uint8, count=width * height).reshape(width, height)
+
+    return np.memmap(
+        file_path,
+        dtype=np.uint8,
+        mode='r',
+        offset=GRID_FILE_HEADER.size,
+        shape=(width, height),
+    )
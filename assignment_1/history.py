@@ -0,0 +1,245 @@
+"""
+Recorders of utility estimates at each iteration of the algorithms,
+for: Plot of utility estimates as a function of the number of iterations.
+
+recorders:
+- HistoryRecorder: records nothing (default of the algorithms)
+- MemoryHistory: records every k-th iteration, of every state or a sample of states
+- DiskHistory: same as MemoryHistory, but spilled into a float32 .npy file
+"""
+import random
+import struct
+
+import numpy as np
+
+# fixed length of .npy header written by DiskHistory,
+# so that it can be rewritten in place as the number of rows grows
+NPY_HEADER_LENGTH = 128
+
+
+class HistoryRecorder:
+    """
+    Records nothing; subclasses record utilities of states at chosen iterations.
+
+    Protocol followed by the algorithms:
+    1. start(states), with every state of the MDP, in order
+    2. record(iteration, utilities) at each iteration,
+        where utilities is a dict, or a np.ndarray in order of states
+    3. finish()
+    """
+    def __init__(self):
+        self.states = []  # states that are recorded
+        self.iterations = []  # iterations that are recorded
+
+    def start(self, states):
+        """
+        params:
+        - states: every state of the MDP, in order
+        """
+        self.iterations = []
+
+    def is_recording(self, iteration) -> bool:
+        """
+        returns: whether utilities at the given iteration are recorded,
+            so that callers can skip forming them otherwise
+        """
+        return False
+
+    def record(self, iteration, utilities):
+        """
+        params:
+        - iteration (int): iteration number, starting from 0
+        - utilities: {
+            state: utility value (float)
+        }, or np.ndarray of utility value of each state
+        """
+        pass
+
+    def finish(self):
+        """
+        To be called after the last iteration.
+        """
+        pass
+
+    def iteration_utilities(self):
+        """
+        returns: {
+            state: [utility at each recorded iteration (float)]
+        }
+        """
+        return {}
+
+
+class MemoryHistory(HistoryRecorder):
+    """
+    Records utilities of every k-th iteration (decimated),
+    of every state or a sample of states, as float arrays in memory.
+    """
+    def __init__(self, every=1, states=None, num_samples=None, seed=None):
+        """
+        params:
+        - every (int): record every k-th iteration; defaults to 1 (every iteration)
+        - states (list): states to record; defaults to None (every state)
+        - num_samples (int): number of states to sample at random instead;
+            defaults to None (not sampled)
+        - seed: seed of the random sample; defaults to None
+        """
+        super().__init__()
+
+        self.every = every
+        self.chosen_states = states
+        self.num_samples = num_samples
+        self.seed = seed
+
+        self._indices = None  # indices of recorded states; None for every state
+        self._rows = []
+
+    def start(self, states):
+        all_states = list(states)
+        self.states = all_states
+
+        if self.chosen_states is not None:
+            self.states = list(self.chosen_states)
+        elif self.num_samples is not None and self.num_samples < len(all_states):
+            sampled = random.Random(self.seed).sample(range(len(all_states)), self.num_samples)
+            self.states = [all_states[index] for index in sorted(sampled)]
+
+        if self.states is all_states:
+            self._indices = None
+        else:
+            state_indices = {state: index for index, state in enumerate(all_states)}
+            self._indices = np.array([state_indices[state] for state in self.states])
+
+        self.iterations = []
+        self._rows = []
+
+    def is_recording(self, iteration):
+        return iteration % self.every == 0
+
+    def record(self, iteration, utilities):
+        if not self.is_recording(iteration):
+            return
+
+        self.iterations.append(iteration)
+        self._rows.append(self._select(utilities))
+
+    def restore(self, states, iterations, rows):
+        """
+        Same as recording the given rows, e.g. for results read from a cache.
+
+        params:
+        - states (list): states that were recorded
+        - iterations (list): iterations that were recorded
+        - rows (np.ndarray): utilities of shape (recorded iterations, recorded states)
+        """
+        self.states = list(states)
+        self.iterations = list(iterations)
+        self._rows = list(rows)
+
+    def iteration_utilities(self):
+        """
+        returns: {
+            state: utility at each recorded iteration (np.ndarray)
+        }
+        """
+        if not self._rows:
+            return {state: [] for state in self.states}
+
+        rows = np.array(self._rows)
+
+        return {
+            state: rows[:, column]
+            for column, state in enumerate(self.states)
+        }
+
+    def _select(self, utilities):
+        """
+        returns: np.ndarray of utility of each recorded state
+        """
+        if isinstance(utilities, dict):
+            return np.array([utilities[state] for state in self.states], dtype=float)
+        elif self._indices is None:
+            return np.array(utilities, dtype=float)
+        else:
+            return np.asarray(utilities, dtype=float)[self._indices]
+
+
+class DiskHistory(MemoryHistory):
+    """
+    Same as MemoryHistory, but each recorded iteration is appended as a float32 row
+    to a .npy file of shape (recorded iterations, recorded states),
+    which is memory-mapped when read.
+    """
+    def __init__(self, file_path, every=1, states=None, num_samples=None, seed=None):
+        """
+        params:
+        - file_path (str): .npy file to write; overwritten if it exists
+        - others: same as MemoryHistory
+        """
+        super().__init__(every, states, num_samples, seed)
+
+        self.file_path = file_path
+        self._file = None
+
+    def start(self, states):
+        super().start(states)
+
+        self._file = open(self.file_path, 'w+b')
+        self._write_header()
+
+    def record(self, iteration, utilities):
+        if not self.is_recording(iteration):
+            return
+
+        self.iterations.append(iteration)
+
+        self._file.seek(0, 2)  # end of file
+        self._file.write(self._select(utilities).astype('<f4').tobytes())
+        self._write_header()
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self):
+        """
+        returns: np.memmap of shape (recorded iterations, recorded states)
+        """
+        if self._file is not None:
+            self._file.flush()
+
+        return np.load(self.file_path, mmap_mode='r')
+
+    def iteration_utilities(self):
+        """
+        returns: {
+            state: memory-mapped utility at each recorded iteration (np.ndarray)
+        }
+        """
+        if not self.iterations:
+            return {state: [] for state in self.states}
+
+        rows = self.load()
+
+        return {
+            state: rows[:, column]
+            for column, state in enumerate(self.states)
+        }
+
+    def _write_header(self):
+        """
+        Writes a .npy (version 1.0) header with the current number of rows,
+        padded to NPY_HEADER_LENGTH bytes.
+        """
+        header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (
+            len(self.iterations),
+            len(self.states),
+        )
+        # magic string (6), version (2), header length (2), header, newline (1)
+        header = header.ljust(NPY_HEADER_LENGTH - 6 - 2 - 2 - 1) + '\n'
+
+        self._file.seek(0)
+        self._file.write(b'\x93NUMPY\x01\x00')
+        self._file.write(struct.pack('<H', len(header)))
+        self._file.write(header.encode('latin1'))
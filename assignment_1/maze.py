@@ -4,7 +4,11 @@ which is also a Markov decision process.
 """
 import enum
 
+import numpy as np
+from scipy import sparse
+
 from assignment_1.base import MarkovDecisionProcess
+from assignment_1.compiled import StencilMDP
 
 
 class MazeAction(enum.Enum):
@@ -16,6 +20,125 @@ class MazeAction(enum.Enum):
     MOVE_LEFT = enum.auto()
     MOVE_RIGHT = enum.auto()
 
+    # only in stencils formed with diagonal=True / stay=True (see form_stencil)
+    MOVE_UP_LEFT = enum.auto()
+    MOVE_UP_RIGHT = enum.auto()
+    MOVE_DOWN_LEFT = enum.auto()
+    MOVE_DOWN_RIGHT = enum.auto()
+    STAY = enum.auto()
+
+
+# colour / type of square stored at each cell of a compact grid (uint8),
+# e.g. CELL_TYPES[3] == 'w'
+CELL_TYPES = (' ', 'g', 'b', 'w')
+WALL = CELL_TYPES.index('w')
+
+# (dx, dy) of the intended move of each action
+ACTION_DIRECTIONS = {
+    MazeAction.MOVE_UP: (0, -1),
+    MazeAction.MOVE_DOWN: (0, 1),
+    MazeAction.MOVE_LEFT: (-1, 0),
+    MazeAction.MOVE_RIGHT: (1, 0),
+    MazeAction.MOVE_UP_LEFT: (-1, -1),
+    MazeAction.MOVE_UP_RIGHT: (1, -1),
+    MazeAction.MOVE_DOWN_LEFT: (-1, 1),
+    MazeAction.MOVE_DOWN_RIGHT: (1, 1),
+    MazeAction.STAY: (0, 0),
+}
+
+# stencil (slip model) of the assignment: for each action, (dx, dy, probability) of
+# intended move (0.8), then unintended moves at right angles (0.1 each);
+# same as form_stencil()
+ACTION_MOVES = {
+    MazeAction.MOVE_UP: ((0, -1, 0.8), (-1, 0, 0.1), (1, 0, 0.1)),
+    MazeAction.MOVE_DOWN: ((0, 1, 0.8), (-1, 0, 0.1), (1, 0, 0.1)),
+    MazeAction.MOVE_LEFT: ((-1, 0, 0.8), (0, -1, 0.1), (0, 1, 0.1)),
+    MazeAction.MOVE_RIGHT: ((1, 0, 0.8), (0, -1, 0.1), (0, 1, 0.1)),
+}
+
+
+def form_stencil(noise=0.2, diagonal=False, stay=False):
+    """
+    Forms a stencil (slip model) where each move slips at right angles
+    to the intended move, with probability noise / 2 to either side.
+
+    params:
+    - noise (float): probability of not making the intended move; defaults to 0.2
+    - diagonal (bool): whether to add the diagonal actions (8-connected moves),
+        which slip to the diagonal moves at right angles; defaults to False
+    - stay (bool): whether to add MazeAction.STAY, which never slips; defaults to False
+
+    return: {
+        action (MazeAction): ((dx, dy, probability), ...), intended move first
+    }, without moves of probability 0
+    """
+    actions = [
+        MazeAction.MOVE_UP,
+        MazeAction.MOVE_DOWN,
+        MazeAction.MOVE_LEFT,
+        MazeAction.MOVE_RIGHT,
+    ]
+
+    if diagonal:
+        actions += [
+            MazeAction.MOVE_UP_LEFT,
+            MazeAction.MOVE_UP_RIGHT,
+            MazeAction.MOVE_DOWN_LEFT,
+            MazeAction.MOVE_DOWN_RIGHT,
+        ]
+
+    stencil = {}
+
+    for action in actions:
+        dx, dy = ACTION_DIRECTIONS[action]
+        moves = [(dx, dy, 1 - noise)]
+
+        # turned 90° either way
+        for slip_dx, slip_dy in sorted([(-dy, dx), (dy, -dx)]):
+            moves.append((slip_dx, slip_dy, noise / 2))
+
+        stencil[action] = tuple(move for move in moves if move[2] > 0)
+
+    if stay:
+        stencil[MazeAction.STAY] = ((0, 0, 1.0),)
+
+    return check_stencil(stencil)
+
+
+def check_stencil(stencil):
+    """
+    params:
+    - stencil (dict): maps each action to ((dx, dy, probability), ...) of its moves
+
+    return: the stencil given, if every action has moves of at most 1 cell
+        in each direction, each move at most once, and probabilities that sum to 1
+    """
+    if not stencil:
+        raise ValueError('stencil has no actions')
+
+    for action, moves in stencil.items():
+        if len({(dx, dy) for dx, dy, _ in moves}) != len(moves):
+            raise ValueError('repeated move of action: ' + str(action))
+
+        for dx, dy, probability in moves:
+            if max(abs(dx), abs(dy)) > 1:
+                raise ValueError('move of more than 1 cell: ' + str((dx, dy)))
+
+            if probability < 0:
+                raise ValueError('negative probability of action: ' + str(action))
+
+        if abs(sum(probability for _, _, probability in moves) - 1) > 1e-9:
+            raise ValueError('probabilities do not sum to 1 for action: ' + str(action))
+
+    return stencil
+
+
+def stencil_moves(stencil):
+    """
+    returns: (dx, dy) of every move of any action of the stencil (sorted list)
+    """
+    return sorted({(dx, dy) for moves in stencil.values() for dx, dy, _ in moves})
+
 
 class Maze(MarkovDecisionProcess):
     """
@@ -28,7 +151,7 @@ class Maze(MarkovDecisionProcess):
     - 'w': wall (obstacle; no accessible)
     """
     # order matters
-    def __init__(self, grid, reward_mapping, starting_point, discount_factor):
+    def __init__(self, grid, reward_mapping, starting_point, discount_factor, stencil=None):
         """
         Initialises:
         - states: {
@@ -48,33 +171,132 @@ class Maze(MarkovDecisionProcess):
         }
         - actions: list of MazeAction
         - discount (for future states): float
+        - stencil (slip model): {
+            action (MazeAction): ((dx, dy, probability), ...)
+        }; defaults to None (ACTION_MOVES)
         """
-        self.grid = grid
+        self.stencil = check_stencil(ACTION_MOVES if stencil is None else stencil)
+
+        # states are formed when grid is set (see grid.setter)
+        super().__init__({}, list(self.stencil), discount_factor)
+
         self.reward_mapping = reward_mapping
         self.starting_point = starting_point  # not used for this assignment
+        self.grid = grid
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid):
+        """
+        Forms states from the grid given, and invalidates the transition table.
+        To be set again if the grid is edited in place.
+        """
+        self._grid = grid
 
         self.width = len(grid)
         self.height = len(grid[0])
 
-        possible_states = {
+        self.states = {
             (x, y): {}
             for x in range(self.width)
             for y in range(self.height)
             if grid[x][y] != 'w'
         }
 
-        possible_actions = [
-            MazeAction.MOVE_UP,
-            MazeAction.MOVE_DOWN,
-            MazeAction.MOVE_LEFT,
-            MazeAction.MOVE_RIGHT,
-        ]
+        for state_position in self.states:
+            self.states[state_position] = \
+                self._form_action_next_state_map(state_position, self.actions)
+
+        self.invalidate_transition_table()
+
+    @property
+    def reward_mapping(self):
+        return self._reward_mapping
+
+    @reward_mapping.setter
+    def reward_mapping(self, reward_mapping):
+        """
+        Rewards of the compiled form are formed again, if it is built.
+        """
+        self._reward_mapping = reward_mapping
+
+        if self._compiled is not None:
+            self._compiled.rewards = np.array([
+                reward_mapping[self.grid[x][y]]
+                for x, y in self._compiled.states
+            ], dtype=float)
+
+    def edit_cells(self, edits):
+        """
+        Changes the colour of some cells, then forms next states, transition table
+        and rewards again for only the states affected, instead of the whole grid.
+        The grid given when initialised is not changed.
+
+        params:
+        - edits (dict): maps x, y position of each edited cell to its new colour
+
+        return: states whose reward or transitions changed (set),
+            e.g. for incremental_value_iteration
+        """
+        changed_states, wall_cells = set(), set()
+
+        # rows are copied, so that the grid given is not edited in place
+        self._grid = list(self._grid)
+
+        for (x, y), colour in edits.items():
+            if colour not in CELL_TYPES:
+                raise ValueError('unknown colour: ' + repr(colour))
 
-        super().__init__(possible_states, possible_actions, discount_factor)
+            if (self._grid[x][y] == 'w') != (colour == 'w'):
+                wall_cells.add((x, y))
 
-        for state_position in possible_states:
-            possible_states[state_position] = \
-                self._form_action_next_state_map(state_position, possible_actions)
+            self._grid[x] = list(self._grid[x])
+            self._grid[x][y] = colour
+            changed_states.add((x, y))
+
+        if wall_cells:
+            # same order as when grid is set (row by row)
+            self.states = {
+                (x, y): self.states.get((x, y))
+                for x in range(self.width)
+                for y in range(self.height)
+                if self._grid[x][y] != 'w'
+            }
+
+            # neighbours now move into / bounce off the edited cells
+            for x, y in wall_cells:
+                changed_states.update(
+                    (x - dx, y - dy)
+                    for dx, dy in stencil_moves(self.stencil)
+                )
+
+            # state indices are shifted
+            self._compiled = None
+
+        changed_states = {state for state in changed_states if state in self.states}
+
+        if wall_cells:
+            for state_position in changed_states:
+                self.states[state_position] = \
+                    self._form_action_next_state_map(state_position, self.actions)
+
+        if self._transition_table is not None:
+            for state_position in wall_cells:
+                self._transition_table.pop(state_position, None)
+
+            for state_position in changed_states:
+                self._transition_table[state_position] = \
+                    self._form_transition_entry(self.states[state_position])
+
+        if self._compiled is not None:
+            for state_position in changed_states:
+                self._compiled.rewards[self._compiled.state_indices[state_position]] = \
+                    self.reward_function(state_position)
+
+        return changed_states
 
     def transition_model(self, state, action, next_state) -> float:
         """
@@ -100,7 +322,92 @@ class Maze(MarkovDecisionProcess):
         colour = self.grid[state[0]][state[1]]
         return self.reward_mapping[colour]
 
-    # helper function - to be called during instantiation
+    def get_next_states(self, state, action: MazeAction):
+        """
+        params:
+        - state (tuple): x, y position
+        - action (MazeAction): action to take at the given state
+
+        return: same as _compute_next_states, formed when grid was set
+        """
+        return self.states[state][action]
+
+    def compile(self):
+        """
+        Formed from the grid with whole-array operations (see StencilMDP),
+        instead of walking through the transition table.
+
+        returns: the MDP in array form (StencilMDP)
+        """
+        if self._compiled is None:
+            grid = encode_grid(self.grid)
+            state_indices, positions = _index_states(grid)
+
+            self._compiled = StencilMDP(
+                list(self.states),
+                self.stencil,
+                _compute_move_successors(state_indices, stencil_moves(self.stencil)),
+                _compute_rewards(grid, positions, self.reward_mapping),
+                self.discount,
+            )
+
+        self._compiled.discount = self.discount
+        return self._compiled
+
+    def transition_matrices(self):
+        """
+        Formed from the grid with whole-array operations,
+        instead of walking through the transition table.
+
+        returns: same as MarkovDecisionProcess.transition_matrices
+        """
+        grid = encode_grid(self.grid)
+        state_indices, positions = _index_states(grid)
+
+        return _form_transition_matrices(
+            self,
+            _compute_move_successors(state_indices, stencil_moves(self.stencil)),
+            _compute_rewards(grid, positions, self.reward_mapping),
+        )
+
+    def _build_transition_table(self):
+        """
+        Reads the next states formed when grid was set,
+        instead of going through get_next_states and transition_model.
+
+        return: transition table (see MarkovDecisionProcess.transition_table)
+        """
+        return {
+            state_position: self._form_transition_entry(action_next_state_map)
+            for state_position, action_next_state_map in self.states.items()
+        }
+
+    def _form_transition_entry(self, action_next_state_map):
+        """
+        params:
+        - action_next_state_map (dict): see _form_action_next_state_map
+
+        return: {
+            action: ((actual_next_state, probability), ...)
+        }
+        """
+        transition_entry = {}
+
+        for action, possible_next_states in action_next_state_map.items():
+            next_state_probabilities = {}
+
+            # more than 1 intended state may end up in the same actual state
+            for next_state in possible_next_states.values():
+                actual_next_state = next_state['actual']
+                next_state_probabilities[actual_next_state] = \
+                    next_state_probabilities.get(actual_next_state, 0) + \
+                    next_state['probability']
+
+            transition_entry[action] = tuple(next_state_probabilities.items())
+
+        return transition_entry
+
+    # helper function - to be called when grid is set
     def _form_action_next_state_map(self, state, actions):
         """
         params:
@@ -108,31 +415,23 @@ class Maze(MarkovDecisionProcess):
         - actions (list): possible actions to take at the state given
 
         return: {
-            MazeAction.MOVE_UP: {
+            action_1 (MazeAction): {
                 intended_next_state (tuple): {
                     'actual': actual_next_state (tuple),
-                    'probability': 0.8 (float)
-                },
-                unintended_next_state_1 (tuple): {
-                    'actual': actual_next_state (tuple),
-                    'probability': 0.1 (float)
-                },
-                unintended_next_state_2 (tuple): {
-                    'actual': actual_next_state (tuple),
-                    'probability': 0.1 (float)
+                    'probability': e.g. 0.8 (float)
                 },
-            }
-            MazeAction.MOVE_DOWN: { ...like in MazeAction.MOVE_UP... },
-            MazeAction.MOVE_LEFT: { ...like in MazeAction.MOVE_UP... },
-            MazeAction.MOVE_RIGHT: { ...like in MazeAction.MOVE_UP... },
-        }
+                ...,
+            },
+            ...,
+            action_n: { ...like in action_1... },
+        }, see _compute_next_states
         """
         return {
-            action: self.get_next_states(state, action)
+            action: self._compute_next_states(state, action)
             for action in actions
         }
 
-    def get_next_states(self, state, action: MazeAction):
+    def _compute_next_states(self, state, action: MazeAction):
         """
         params:
         - state (tuple): x, y position
@@ -141,168 +440,471 @@ class Maze(MarkovDecisionProcess):
         return: {
             intended_next_state (tuple): {
                 'actual': actual_next_state (tuple),
-                'probability': 0.8 (float)
-            },
-            unintended_next_state_1 (tuple): {
-                'actual': actual_next_state (tuple),
-                'probability': 0.1 (float)
+                'probability': probability of the move in the stencil (float)
             },
-            unintended_next_state_2 (tuple): {
-                'actual': actual_next_state (tuple),
-                'probability': 0.1 (float)
-            },
-        }
+            ...,
+        }, in order of the moves of the action in the stencil
         """
-        if action is MazeAction.MOVE_UP:
+        next_states = {}
 
-            above_state = (state[0], state[1] - 1)
+        for dx, dy, probability in self.stencil[action]:
+            intended_next_state = (state[0] + dx, state[1] + dy)
 
-            if above_state in self.states:
-                actual_above_state = above_state 
+            if intended_next_state in self.states:
+                actual_next_state = intended_next_state
             else:
-                actual_above_state = state  # invalid state -> remain same spot
+                actual_next_state = state  # invalid state -> remain same spot
 
-            left_state = (state[0] - 1, state[1])
+            next_states[intended_next_state] = {
+                'actual': actual_next_state,
+                'probability': probability,
+            }
 
-            if left_state in self.states:
-                actual_left_state = left_state 
-            else:
-                actual_left_state = state  # invalid state -> remain same spot
+        return next_states
 
-            right_state = (state[0] + 1, state[1])
 
-            if right_state in self.states:
-                actual_right_state = right_state 
-            else:
-                actual_right_state = state  # invalid state -> remain same spot
-
-            next_states = { 
-                above_state: {
-                    'actual': actual_above_state,
-                    'probability': 0.8,
-                }, 
-                left_state: {
-                    'actual': actual_left_state,
-                    'probability': 0.1,
-                }, 
-                right_state: {
-                    'actual': actual_right_state,
-                    'probability': 0.1,
-                }, 
-            }
+class CompactMaze(MarkovDecisionProcess):
+    """
+    Same maze as Maze, but stored in flat numpy arrays instead of nested dicts,
+    so that very large grids fit in memory (tens of bytes per state).
+
+    arrays:
+    - grid: uint8 array of shape (width, height); index into CELL_TYPES
+    - state_indices: int32 array of shape (width, height);
+        index of the state at each cell, -1 for walls
+    - positions: int32 array of shape (S, 2); x, y position of each state
+    - move_successors: int32 array of shape (M, S);
+        index of actual next state of each move in stencil_moves(stencil)
+    """
+    __slots__ = (
+        '_grid',
+        '_reward_mapping',
+        'starting_point',
+        'stencil',
+        'width',
+        'height',
+        'state_indices',
+        'positions',
+        'move_successors',
+    )
+
+    def __init__(self, grid, reward_mapping, starting_point, discount_factor, stencil=None):
+        """
+        params:
+        - grid: 2D array (list of list) of colours, like for Maze,
+            or uint8 np.ndarray of indices into CELL_TYPES
+        - reward_mapping (dict): maps colour to reward
+        - starting_point (dict): not used for this assignment
+        - discount_factor (float)
+        - stencil (dict): same as for Maze; defaults to None (ACTION_MOVES)
+        """
+        self.stencil = check_stencil(ACTION_MOVES if stencil is None else stencil)
 
-        elif action is MazeAction.MOVE_DOWN:
+        # states are formed when grid is set (see grid.setter)
+        super().__init__(None, list(self.stencil), discount_factor)
 
-            below_state = (state[0], state[1] + 1)
-            
-            if below_state in self.states:
-                actual_below_state = below_state 
-            else:
-                actual_below_state = state  # invalid state -> remain same spot
+        self.reward_mapping = reward_mapping
+        self.starting_point = starting_point
+        self.grid = grid
 
-            left_state = (state[0] - 1, state[1])
-            
-            if left_state in self.states:
-                actual_left_state = left_state 
-            else:
-                actual_left_state = state  # invalid state -> remain same spot
+    @property
+    def grid(self):
+        return self._grid
 
-            right_state = (state[0] + 1, state[1])
+    @grid.setter
+    def grid(self, grid):
+        """
+        Forms state indices and successors of each move from the grid given,
+        and invalidates the transition table.
+        """
+        if isinstance(grid, np.ndarray):
+            grid = grid.astype(np.uint8, copy=False)
+        else:
+            grid = encode_grid(grid)
 
-            if right_state in self.states:
-                actual_right_state = right_state 
-            else:
-                actual_right_state = state  # invalid state -> remain same spot
-
-            next_states = {
-                below_state: {
-                    'actual': actual_below_state,
-                    'probability': 0.8,
-                }, 
-                left_state: {
-                    'actual': actual_left_state,
-                    'probability': 0.1,
-                }, 
-                right_state: {
-                    'actual': actual_right_state,
-                    'probability': 0.1,
-                },
-            }
+        self._grid = grid
+        self.width, self.height = grid.shape
 
-        elif action is MazeAction.MOVE_LEFT:
+        self.state_indices, self.positions = _index_states(grid)
+        self.move_successors = _compute_move_successors(
+            self.state_indices,
+            stencil_moves(self.stencil),
+        )
 
-            left_state = (state[0] - 1, state[1])
-            
-            if left_state in self.states:
-                actual_left_state = left_state 
-            else:
-                actual_left_state = state  # invalid state -> remain same spot
+        self.states = CompactStates(self)
+        self.invalidate_transition_table()
 
-            above_state = (state[0], state[1] - 1)
+    @property
+    def reward_mapping(self):
+        return self._reward_mapping
 
-            if above_state in self.states:
-                actual_above_state = above_state 
-            else:
-                actual_above_state = state  # invalid state -> remain same spot
+    @reward_mapping.setter
+    def reward_mapping(self, reward_mapping):
+        """
+        Rewards of the compiled form are formed again, if it is built.
+        """
+        self._reward_mapping = reward_mapping
 
-            below_state = (state[0], state[1] + 1)
+        if self._compiled is not None:
+            self._compiled.rewards = _compute_rewards(self.grid, self.positions, reward_mapping)
 
-            if below_state in self.states:
-                actual_below_state = below_state 
-            else:
-                actual_below_state = state  # invalid state -> remain same spot
+    def edit_cells(self, edits):
+        """
+        Same as Maze.edit_cells.
+        Colour changes only patch rewards of the compiled form;
+        walls that are added or removed shift state indices,
+        so state indices and successors are formed again from the whole grid.
 
-            next_states = {
-                left_state: {
-                    'actual': actual_left_state,
-                    'probability': 0.8,
-                },
-                above_state: {
-                    'actual': actual_above_state,
-                    'probability': 0.1,
-                }, 
-                below_state: {
-                    'actual': actual_below_state,
-                    'probability': 0.1,
-                }, 
-            }
+        params:
+        - edits (dict): maps x, y position of each edited cell to its new colour
 
-        else:  # action is MazeAction.MOVE_RIGHT
+        return: states whose reward or transitions changed (set)
+        """
+        grid = self.grid.copy()  # so that the grid given is not edited in place
+        edited_cells, wall_cells = [], []
 
-            right_state = (state[0] + 1, state[1])
+        for (x, y), colour in edits.items():
+            if colour not in CELL_TYPES:
+                raise ValueError('unknown colour: ' + repr(colour))
 
-            if right_state in self.states:
-                actual_right_state = right_state 
-            else:
-                actual_right_state = state  # invalid state -> remain same spot
+            cell_type = CELL_TYPES.index(colour)
 
-            above_state = (state[0], state[1] - 1)
+            if (grid[x, y] == WALL) != (cell_type == WALL):
+                wall_cells.append((x, y))
 
-            if above_state in self.states:
-                actual_above_state = above_state 
-            else:
-                actual_above_state = state  # invalid state -> remain same spot
+            grid[x, y] = cell_type
+            edited_cells.append((x, y))
 
-            below_state = (state[0], state[1] + 1)
+        if wall_cells:
+            self.grid = grid
 
-            if below_state in self.states:
-                actual_below_state = below_state 
-            else:
-                actual_below_state = state  # invalid state -> remain same spot
+            # neighbours now move into / bounce off the edited cells
+            edited_cells += [
+                (x - dx, y - dy)
+                for x, y in wall_cells
+                for dx, dy in stencil_moves(self.stencil)
+            ]
+        else:
+            self._grid = grid
 
-            next_states = {
-                right_state: {
-                    'actual': actual_right_state,
-                    'probability': 0.8,
-                },
-                above_state: {
-                    'actual': actual_above_state,
-                    'probability': 0.1,
-                }, 
-                below_state: {
-                    'actual': actual_below_state,
-                    'probability': 0.1,
-                },
+        changed_states = {state for state in edited_cells if state in self.states}
+
+        if self._compiled is not None:
+            for x, y in changed_states:
+                self._compiled.rewards[self.state_indices[x, y]] = \
+                    self.reward_function((x, y))
+
+        return changed_states
+
+    @property
+    def nbytes(self):
+        """
+        returns: number of bytes used by the arrays of this maze
+        """
+        return self.grid.nbytes + self.state_indices.nbytes + \
+            self.positions.nbytes + self.move_successors.nbytes
+
+    def transition_model(self, state, action, next_state) -> float:
+        """
+        params
+        - state (tuple): x, y position
+        - action (MazeAction): action to take at the given state
+        - next_state (tuple): intended x, y position (may be invalid)
+
+        return:
+        probability which ranges from 0 to 1, inclusive (float)
+        """
+        if state not in self.states:
+            raise KeyError(state)
+
+        move = (next_state[0] - state[0], next_state[1] - state[1])
+
+        for dx, dy, probability in self.stencil[action]:
+            if move == (dx, dy):
+                return probability
+
+        return 0
+
+    def reward_function(self, state):
+        """
+        params:
+        - state (tuple): x, y position
+
+        return: reward value (float)
+        """
+        colour = CELL_TYPES[self.grid[state[0], state[1]]]
+        return self.reward_mapping[colour]
+
+    def get_next_states(self, state, action: MazeAction):
+        """
+        params:
+        - state (tuple): x, y position
+        - action (MazeAction): action to take at the given state
+
+        return: same as Maze.get_next_states, formed from successors of each move
+        """
+        state_index = self.state_indices[state[0], state[1]]
+        move_indices = {move: index for index, move in enumerate(stencil_moves(self.stencil))}
+        next_states = {}
+
+        for dx, dy, probability in self.stencil[action]:
+            next_state_index = self.move_successors[move_indices[(dx, dy)], state_index]
+            intended_next_state = (state[0] + dx, state[1] + dy)
+            next_states[intended_next_state] = {
+                'actual': tuple(self.positions[next_state_index].tolist()),
+                'probability': probability,
             }
 
         return next_states
+
+    @property
+    def transition_table(self):
+        """
+        Formed from successors of each move for each state on access,
+        instead of being stored for every state.
+
+        returns: same as MarkovDecisionProcess.transition_table
+        """
+        if self._transition_table is None:
+            self._transition_table = CompactTransitionTable(self)
+
+        return self._transition_table
+
+    def compile(self):
+        """
+        Reuses successors of each move (see StencilMDP).
+
+        returns: the MDP in array form (StencilMDP)
+        """
+        if self._compiled is None:
+            self._compiled = StencilMDP(
+                self.states,
+                self.stencil,
+                self.move_successors,
+                _compute_rewards(self.grid, self.positions, self.reward_mapping),
+                self.discount,
+            )
+
+        self._compiled.discount = self.discount
+        return self._compiled
+
+    def transition_matrices(self):
+        """
+        Formed from successors of each move.
+
+        returns: same as MarkovDecisionProcess.transition_matrices
+        """
+        return _form_transition_matrices(
+            self,
+            self.move_successors,
+            _compute_rewards(self.grid, self.positions, self.reward_mapping),
+        )
+
+
+class CompactStates:
+    """
+    Read-only view of the states of a CompactMaze,
+    which yields (x, y) positions like the keys of Maze.states.
+    """
+    __slots__ = ('maze',)
+
+    def __init__(self, maze):
+        self.maze = maze
+
+    def __len__(self):
+        return len(self.maze.positions)
+
+    def __iter__(self):
+        return map(tuple, self.maze.positions.tolist())
+
+    def __contains__(self, state):
+        x, y = state
+        return 0 <= x < self.maze.width and 0 <= y < self.maze.height and \
+            self.maze.state_indices[x, y] >= 0
+
+
+class CompactTransitionTable:
+    """
+    Read-only view of the transition table of a CompactMaze.
+    """
+    __slots__ = ('maze',)
+
+    def __init__(self, maze):
+        self.maze = maze
+
+    def __getitem__(self, state):
+        """
+        returns: {
+            action: ((actual_next_state, probability), ...)
+        }
+        """
+        if state not in self.maze.states:
+            raise KeyError(state)
+
+        positions = self.maze.positions
+        state_index = self.maze.state_indices[state[0], state[1]]
+        stencil = self.maze.stencil
+
+        # actual next state of each move
+        next_states = dict(zip(
+            stencil_moves(stencil),
+            map(tuple, positions[self.maze.move_successors[:, state_index]].tolist()),
+        ))
+        action_next_states = {}
+
+        for action in self.maze.actions:
+            next_state_probabilities = {}
+
+            for dx, dy, probability in stencil[action]:
+                next_state = next_states[(dx, dy)]
+                next_state_probabilities[next_state] = \
+                    next_state_probabilities.get(next_state, 0) + probability
+
+            action_next_states[action] = tuple(next_state_probabilities.items())
+
+        return action_next_states
+
+
+def encode_grid(grid):
+    """
+    params:
+    - grid (list of list): colour of each square
+
+    return: uint8 np.ndarray of indices into CELL_TYPES
+    """
+    grid = np.asarray(grid)
+    encoded_grid = np.empty(grid.shape, dtype=np.uint8)
+    is_encoded = np.zeros(grid.shape, dtype=bool)
+
+    for cell_type, colour in enumerate(CELL_TYPES):
+        is_colour = grid == colour
+        encoded_grid[is_colour] = cell_type
+        is_encoded |= is_colour
+
+    if not is_encoded.all():
+        raise ValueError('unknown colour in grid: ' + repr(grid[~is_encoded][0]))
+
+    return encoded_grid
+
+
+def decode_grid(grid):
+    """
+    params:
+    - grid (np.ndarray): uint8 array of indices into CELL_TYPES
+
+    return: 2D array (list of list) of colours, like for Maze
+    """
+    return np.array(CELL_TYPES)[grid].tolist()
+
+
+def _index_states(grid):
+    """
+    params:
+    - grid (np.ndarray): uint8 array of indices into CELL_TYPES
+
+    return: (
+        state_indices: int32 np.ndarray of same shape as grid;
+            index of the state at each cell, -1 for walls,
+        positions: int32 np.ndarray of shape (S, 2); x, y position of each state,
+    )
+    """
+    # states in same order as Maze (row by row)
+    flat_state_cells = np.flatnonzero(grid.ravel() != WALL)
+
+    state_indices = np.full(grid.shape, -1, dtype=np.int32)
+    state_indices.ravel()[flat_state_cells] = \
+        np.arange(len(flat_state_cells), dtype=np.int32)
+
+    positions = np.empty((len(flat_state_cells), 2), dtype=np.int32)
+    positions[:, 0], positions[:, 1] = np.divmod(flat_state_cells, grid.shape[1])
+
+    return state_indices, positions
+
+
+def _compute_rewards(grid, positions, reward_mapping):
+    """
+    params:
+    - grid (np.ndarray): uint8 array of indices into CELL_TYPES
+    - positions (np.ndarray): x, y position of each state
+    - reward_mapping (dict): maps colour to reward
+
+    return: float np.ndarray of shape (S,); reward of each state
+    """
+    rewards_by_cell_type = np.array([
+        reward_mapping.get(colour, 0)
+        for colour in CELL_TYPES
+    ], dtype=float)
+
+    return rewards_by_cell_type[grid[positions[:, 0], positions[:, 1]]]
+
+
+def _compute_move_successors(state_indices, moves):
+    """
+    params:
+    - state_indices (np.ndarray): index of the state at each cell, -1 for walls
+    - moves (list): (dx, dy) of each move, of at most 1 cell in each direction
+
+    return: int32 np.ndarray of shape (M, S);
+        index of actual next state of each move
+    """
+    # border of walls, so that moving out of bounds is same as moving into a wall
+    padded_state_indices = np.pad(state_indices, 1, constant_values=-1)
+    width, height = state_indices.shape
+    is_state = state_indices >= 0
+
+    move_successors = np.empty((len(moves), np.count_nonzero(is_state)), dtype=np.int32)
+
+    for move_index, (dx, dy) in enumerate(moves):
+        # index of the state each cell moves into: the grid shifted by the move
+        shifted_state_indices = padded_state_indices[
+            1 + dx:width + 1 + dx,
+            1 + dy:height + 1 + dy,
+        ]
+
+        # invalid state -> remain same spot
+        move_successors[move_index] = np.where(
+            shifted_state_indices >= 0,
+            shifted_state_indices,
+            state_indices,
+        )[is_state]
+
+    return move_successors
+
+
+def _form_transition_matrices(maze, move_successors, rewards):
+    """
+    params:
+    - maze (Maze or CompactMaze): the maze to export
+    - move_successors (np.ndarray): index of actual next state of each move
+        in stencil_moves(maze.stencil)
+    - rewards (np.ndarray): reward of each state
+
+    return: same as MarkovDecisionProcess.transition_matrices
+    """
+    states = list(maze.states)
+    num_states = len(states)
+    move_indices = {move: index for index, move in enumerate(stencil_moves(maze.stencil))}
+    matrices = []
+
+    for moves in maze.stencil.values():
+        probabilities = np.array([probability for _, _, probability in moves])
+
+        # moves that end up in the same actual state (e.g. walls on 2 sides) are summed
+        matrices.append(sparse.csr_matrix(
+            (
+                np.repeat(probabilities, num_states),
+                (
+                    np.tile(np.arange(num_states), len(moves)),
+                    move_successors[[move_indices[(dx, dy)] for dx, dy, _ in moves]].ravel(),
+                ),
+            ),
+            shape=(num_states, num_states),
+        ))
+
+    return {
+        'states': states,
+        'actions': list(maze.actions),
+        'transition_matrices': matrices,
+        'rewards': rewards,
+        'state_indices': {state: index for index, state in enumerate(states)},
+    }
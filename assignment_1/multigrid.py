@@ -0,0 +1,281 @@
+"""
+Value iteration on a maze, started from utilities of coarser versions of the maze
+(coarse-to-fine multigrid initialization).
+
+Each coarser level aggregates 2x2 blocks of cells of the level below:
+- a block is a wall only if all of its cells are walls
+- the reward of a block is the highest reward of its cells that are not walls
+    (an agent in the block can move to its best cell, and stay near it),
+    scaled to 1 step of the block (see _coarsen)
+- 1 step of the block is 2 steps of the level below, so its discount is γ²
+
+The coarsest level is solved from zero utilities, then the utilities of each level
+are copied into every cell of each block (interpolated) as the utilities that
+the level below starts from. Coarser levels have fewer states and smaller discounts,
+so they take fewer sweeps, and the finest level starts close to its solution.
+
+Regions of the maze smaller than 1 cell of the coarsest level (e.g. a square walled in)
+cannot be told apart from their neighbours by the coarser levels, and nothing
+flows into or out of them, so errors they start with only shrink by γ each sweep.
+So their states start from their own solution instead (see _solve_small_regions).
+"""
+import time
+
+import numpy as np
+from scipy.sparse import csgraph
+
+from assignment_1.algorithms import run_numpy_sweeps
+from assignment_1.compiled import CompiledMDP
+from assignment_1.components import get_state_graph
+from assignment_1.history import HistoryRecorder
+from assignment_1.maze import CELL_TYPES, WALL, CompactMaze, encode_grid
+
+# levels are coarsened until the grid is at most this long on its shorter side
+MIN_GRID_LENGTH = 16
+
+
+def multigrid_value_iteration(
+    maze,
+    max_error=1,
+    verbose=False,
+    min_grid_length=MIN_GRID_LENGTH,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+):
+    """
+    Same as value_iteration (Jacobi sweeps, backend='numpy'),
+    but started from the utilities of coarser levels of the maze.
+    The usual δ < ϵ(1−γ)/γ test on the maze itself stops it,
+    so the usual bound on the error of any state holds, whatever it starts from.
+
+    params:
+    - maze (Maze or CompactMaze): the maze to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+        (of every level)
+    - verbose (bool): determine whether to print information
+    - min_grid_length (int): levels are coarsened until the shorter side of the grid
+        is at most this long; defaults to MIN_GRID_LENGTH
+    - history (HistoryRecorder): records utilities at each iteration of the maze itself;
+        defaults to None (not recorded)
+    - on_iteration: same as value_iteration, for iterations of the maze itself;
+        defaults to None (not observed)
+
+    return: same as value_iteration, where iterations are of the maze itself, and with
+        'num_coarse_iterations': number of iterations of every coarser level,
+            and of small regions (int),
+        'num_levels': number of levels, including the maze itself (int)
+    """
+    if history is None:
+        history = HistoryRecorder()
+
+    grid = maze.grid if isinstance(maze.grid, np.ndarray) else encode_grid(maze.grid)
+    rewards_by_cell_type = np.array([
+        maze.reward_mapping.get(colour, 0)
+        for colour in CELL_TYPES
+    ], dtype=float)
+
+    # (is_state, rewards, discount) of each level, finest first
+    levels = [(grid != WALL, rewards_by_cell_type[grid], maze.discount)]
+
+    while min(levels[-1][0].shape) > min_grid_length:
+        levels.append(_coarsen(*levels[-1]))
+
+    # utilities of the level above each cell of the current level; None at the coarsest
+    cell_utilities = None
+    num_coarse_iterations = 0
+
+    for level in range(len(levels) - 1, 0, -1):
+        is_state, rewards, discount = levels[level]
+        coarse_maze = _form_maze(is_state, discount, maze.stencil)
+
+        compiled = coarse_maze.compile()
+        compiled.rewards = rewards[is_state]  # in order of states (row by row)
+
+        start_time = time.perf_counter()
+
+        utilities, _, num_iterations = run_numpy_sweeps(
+            compiled,
+            max_error,
+            False,
+            'jacobi',
+            HistoryRecorder(),
+            None,
+            _get_initial_utilities(coarse_maze.positions, cell_utilities),
+        )
+
+        num_coarse_iterations += num_iterations
+
+        if verbose:
+            print(
+                'level:', level,
+                '-grid shape:', is_state.shape,
+                '-number of states:', compiled.num_states,
+                '-iterations:', num_iterations,
+                '-seconds:', '{:.3f}'.format(time.perf_counter() - start_time),
+            )
+
+        # U of each cell of the level below: U of its block
+        level_utilities = np.zeros(is_state.shape)
+        level_utilities[is_state] = utilities
+
+        below_shape = levels[level - 1][0].shape
+        cell_utilities = np.repeat(np.repeat(level_utilities, 2, axis=0), 2, axis=1)
+        cell_utilities = cell_utilities[:below_shape[0], :below_shape[1]]
+
+    compiled = maze.compile()
+
+    if hasattr(maze, 'positions'):
+        positions = maze.positions
+    else:
+        positions = np.array(list(maze.states), dtype=np.intp).reshape(-1, 2)
+
+    initial_utilities = _get_initial_utilities(positions, cell_utilities)
+
+    if initial_utilities is not None:
+        # smaller than 1 cell of the coarsest level
+        max_region_size = 4 ** (len(levels) - 1) - 1
+
+        small_region_states, small_region_utilities, num_iterations = \
+            _solve_small_regions(compiled, max_error, max_region_size)
+
+        initial_utilities[small_region_states] = small_region_utilities
+        num_coarse_iterations += num_iterations
+
+        if verbose:
+            print(
+                'small regions',
+                '-number of states:', small_region_states.size,
+                '-iterations:', num_iterations,
+            )
+
+    utilities, optimal_policy, num_iterations = run_numpy_sweeps(
+        compiled,
+        max_error,
+        verbose,
+        'jacobi',
+        history,
+        on_iteration,
+        initial_utilities,
+    )
+
+    return {
+        'utilities': compiled.to_state_dict(utilities),
+        'optimal_policy': compiled.to_policy_dict(optimal_policy),
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+        'num_coarse_iterations': num_coarse_iterations,
+        'num_levels': len(levels),
+    }
+
+
+def _coarsen(is_state, rewards, discount):
+    """
+    Aggregates 2x2 blocks of cells into 1 cell each
+    (a grid of odd length is padded with walls).
+
+    The highest reward of the cells of a block is scaled so that a block of reward R
+    has the same utility R / (1 − γ) as a cell of reward R:
+    R (1 − γ²) / (1 − γ), i.e. R + γR for 2 steps of the level below.
+
+    params:
+    - is_state (np.ndarray): whether each cell is a state (not a wall), shape (W, H)
+    - rewards (np.ndarray): reward of each cell, shape (W, H)
+    - discount (float): discount γ of the level
+
+    return: (is_state, rewards, discount) of the coarser level,
+        with shape (⌈W / 2⌉, ⌈H / 2⌉) and discount γ²
+    """
+    width, height = is_state.shape
+    padding = ((0, width % 2), (0, height % 2))
+
+    rewards = np.pad(np.where(is_state, rewards, -np.inf), padding, constant_values=-np.inf)
+    is_state = np.pad(is_state, padding, constant_values=False)
+
+    block_shape = (is_state.shape[0] // 2, 2, is_state.shape[1] // 2, 2)
+    coarse_is_state = is_state.reshape(block_shape).any(axis=(1, 3))
+    block_rewards = np.where(coarse_is_state, rewards.reshape(block_shape).max(axis=(1, 3)), 0)
+
+    coarse_discount = discount ** 2
+    coarse_rewards = block_rewards * (1 - coarse_discount) / (1 - discount)
+
+    return coarse_is_state, coarse_rewards, coarse_discount
+
+
+def _form_maze(is_state, discount, stencil):
+    """
+    returns: CompactMaze of the states given, with the stencil of the maze
+        (rewards are set on its compiled form)
+    """
+    return CompactMaze(
+        np.where(is_state, CELL_TYPES.index(' '), WALL).astype(np.uint8),
+        {},
+        None,
+        discount,
+        stencil,
+    )
+
+
+def _solve_small_regions(compiled: CompiledMDP, max_error, max_region_size):
+    """
+    Solves every region (weakly connected component of the graph of states)
+    of at most max_region_size states at once. Nothing moves into or out of a region,
+    so each one is an MDP of its own.
+
+    params:
+    - compiled (CompiledMDP): the MDP
+    - max_error (float): the maximum error allowed in the utility of any state
+    - max_region_size (int)
+
+    return: (
+        indices of states in small regions (np.ndarray),
+        utility of each of them (np.ndarray),
+        number of iterations (int),
+    )
+    """
+    _, regions = csgraph.connected_components(
+        get_state_graph(compiled),
+        directed=True,
+        connection='weak',
+    )
+    small_region_states = np.flatnonzero(np.bincount(regions)[regions] <= max_region_size)
+
+    if small_region_states.size == 0:
+        return small_region_states, np.zeros(0), 0
+
+    # index of each state among the states of small regions
+    small_region_indices = np.full(compiled.num_states, -1, dtype=np.intp)
+    small_region_indices[small_region_states] = np.arange(small_region_states.size)
+
+    utilities, _, num_iterations = run_numpy_sweeps(
+        CompiledMDP(
+            small_region_states,  # only recorded by history, which is off
+            compiled.actions,
+            small_region_indices[compiled.next_states[small_region_states]],
+            compiled.probabilities[small_region_states],
+            compiled.rewards[small_region_states],
+            compiled.discount,
+        ),
+        max_error,
+        False,
+        'jacobi',
+        HistoryRecorder(),
+        None,
+    )
+
+    return small_region_states, utilities, num_iterations
+
+
+def _get_initial_utilities(positions, cell_utilities):
+    """
+    params:
+    - positions (np.ndarray): x, y position of each state, shape (S, 2)
+    - cell_utilities (np.ndarray): utility of the block above each cell;
+        None at the coarsest level
+
+    return: utility of each state to start from (np.ndarray); None for zero
+    """
+    if cell_utilities is None:
+        return None
+
+    return cell_utilities[positions[:, 0], positions[:, 1]]
@@ -0,0 +1,129 @@
+"""
+Observers of the algorithms, called once per iteration with an IterationInfo.
+
+An observer is any callable that takes an IterationInfo;
+if it returns True, the algorithm stops after that iteration.
+The algorithms take 1 observer or a list of observers as on_iteration.
+
+observers:
+- LoggingObserver: logs each iteration with the logging module
+- EarlyAbort: stops after a number of iterations or seconds
+- MetricsCollector: keeps every IterationInfo, to be read as arrays afterwards
+"""
+import collections
+import logging
+
+import numpy as np
+
+IterationInfo = collections.namedtuple(
+    'IterationInfo',
+    [
+        'iteration',  # number of iterations done, including this one (int)
+        'max_residual',  # maximum change in the utility of any state (float)
+        'num_policy_changes',  # number of states whose best action changed (int)
+        'sweep_seconds',  # wall time of this iteration (float)
+        'num_backups',  # number of Bellman backups in this iteration (int)
+    ],
+)
+
+
+def notify(on_iteration, iteration_info) -> bool:
+    """
+    params:
+    - on_iteration: observer, or list of observers
+    - iteration_info (IterationInfo)
+
+    return: whether any observer asks to stop
+    """
+    if not isinstance(on_iteration, (list, tuple)):
+        return bool(on_iteration(iteration_info))
+
+    should_stop = False
+
+    # every observer is called, even after one asks to stop
+    for observer in on_iteration:
+        should_stop = bool(observer(iteration_info)) or should_stop
+
+    return should_stop
+
+
+class LoggingObserver:
+    """
+    Logs every k-th iteration at INFO level.
+    """
+    def __init__(self, logger=None, every=1):
+        """
+        params:
+        - logger (logging.Logger): defaults to None (logger of this module)
+        - every (int): log every k-th iteration; defaults to 1 (every iteration)
+        """
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self.every = every
+
+    def __call__(self, iteration_info):
+        if iteration_info.iteration % self.every == 0:
+            self.logger.info(
+                'iteration: %d -maximum change: %.6f -policy changes: %d '
+                '-seconds: %.3f -backups: %d',
+                *iteration_info
+            )
+
+
+class EarlyAbort:
+    """
+    Stops an algorithm after a number of iterations, or a number of seconds in total.
+    """
+    def __init__(self, max_iterations=None, max_seconds=None):
+        """
+        params:
+        - max_iterations (int): defaults to None (no limit)
+        - max_seconds (float): defaults to None (no limit)
+        """
+        self.max_iterations = max_iterations
+        self.max_seconds = max_seconds
+
+        self.total_seconds = 0
+        self.aborted = False  # whether this observer stopped the algorithm
+
+    def __call__(self, iteration_info):
+        self.total_seconds += iteration_info.sweep_seconds
+
+        self.aborted = (
+            self.max_iterations is not None and iteration_info.iteration >= self.max_iterations
+        ) or (
+            self.max_seconds is not None and self.total_seconds >= self.max_seconds
+        )
+
+        return self.aborted
+
+
+class MetricsCollector:
+    """
+    Keeps every IterationInfo as a plain tuple, converted to arrays only when read.
+    """
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, iteration_info):
+        self.rows.append(iteration_info)
+
+    def as_arrays(self):
+        """
+        returns: {
+            field of IterationInfo: value at each iteration (np.ndarray)
+        }
+        """
+        columns = zip(*self.rows) if self.rows else [()] * len(IterationInfo._fields)
+
+        return {
+            field: np.array(column)
+            for field, column in zip(IterationInfo._fields, columns)
+        }
+
+    @property
+    def total_seconds(self):
+        return sum(iteration_info.sweep_seconds for iteration_info in self.rows)
+
+    @property
+    def total_backups(self):
+        return sum(iteration_info.num_backups for iteration_info in self.rows)
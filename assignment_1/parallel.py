@@ -0,0 +1,301 @@
+"""
+Value iteration on a maze, split across a pool of processes.
+
+The grid is split into strips of rows, 1 strip per worker.
+Utilities live in 2 shared memory buffers (previous sweep / this sweep),
+so each worker reads the 1 row above and below its strip (the halo)
+straight from the previous sweep, and writes only its own rows.
+"""
+import multiprocessing
+import time
+
+import numpy as np
+
+from assignment_1.history import HistoryRecorder
+from assignment_1.observers import IterationInfo, notify
+from assignment_1.maze import CELL_TYPES, WALL, CompactMaze, encode_grid, stencil_moves
+
+# arrays attached by each process, and their shared memory blocks;
+# see _attach_shared_arrays
+_shared_arrays, _shared_blocks = {}, {}
+
+
+def parallel_value_iteration(
+    maze,
+    max_error=1,
+    verbose=False,
+    num_workers=None,
+    history: HistoryRecorder=None,
+    on_iteration=None,
+):
+    """
+    Same as value_iteration (Jacobi sweeps), but each sweep is split into
+    strips of rows that are swept by a pool of processes at the same time.
+    The maximum change of each strip is reduced into the maximum change of any state,
+    for the usual δ < ϵ(1−γ)/γ test.
+
+    params:
+    - maze (Maze or CompactMaze): the maze to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - num_workers (int): number of processes; defaults to None (number of CPUs)
+    - history (HistoryRecorder): records utilities at each iteration;
+        defaults to None (not recorded)
+    - on_iteration: same as value_iteration; defaults to None (not observed)
+
+    return: same as value_iteration
+    """
+    shared_memory = _import_shared_memory()
+
+    if num_workers is None:
+        num_workers = multiprocessing.cpu_count()
+
+    if history is None:
+        history = HistoryRecorder()
+
+    grid = maze.grid if isinstance(maze, CompactMaze) else encode_grid(maze.grid)
+    width, height = grid.shape
+
+    # border of walls, so that moving out of bounds is same as moving into a wall
+    is_state = np.pad(grid != WALL, 1, constant_values=False)
+    rewards_by_cell_type = np.array([
+        maze.reward_mapping.get(colour, 0)
+        for colour in CELL_TYPES
+    ], dtype=float)
+    rewards = np.pad(rewards_by_cell_type[grid], 1, constant_values=0)
+
+    strips = [
+        (rows[0], rows[-1] + 1)
+        for rows in np.array_split(np.arange(width), min(num_workers, width))
+        if len(rows) > 0
+    ]
+
+    shared_blocks = []
+
+    try:
+        specs = {}
+
+        for name, shape, dtype in (
+            ('utilities', (2,) + is_state.shape, np.float64),
+            ('rewards', is_state.shape, np.float64),
+            ('is_state', is_state.shape, np.bool_),
+            ('policy', grid.shape, np.intp),
+        ):
+            block = shared_memory.SharedMemory(
+                create=True,
+                size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1),
+            )
+            shared_blocks.append(block)
+            specs[name] = (block.name, shape, dtype)
+
+        _attach_shared_arrays(specs)
+        _shared_arrays['utilities'][:] = 0  # U,U′, initially zero
+        _shared_arrays['rewards'][:] = rewards
+        _shared_arrays['is_state'][:] = is_state
+        _shared_arrays['policy'][:] = -1  # no action yet
+
+        with multiprocessing.Pool(
+            len(strips),
+            initializer=_attach_shared_arrays,
+            initargs=(specs,),
+        ) as pool:
+            result = _run_sweeps(
+                maze,
+                max_error,
+                verbose,
+                pool,
+                strips,
+                history,
+                on_iteration,
+            )
+    finally:
+        _detach_shared_arrays()
+
+        for block in shared_blocks:
+            block.close()
+            block.unlink()
+
+    return result
+
+
+def _run_sweeps(maze, max_error, verbose, pool, strips, history, on_iteration):
+    """
+    params:
+    - maze (Maze or CompactMaze): the maze to solve
+    - max_error (float): the maximum error allowed in the utility of any state
+    - verbose (bool): determine whether to print information
+    - pool (multiprocessing.Pool): workers that have attached the shared arrays
+    - strips (list): (first row, last row + 1) of each strip
+    - history (HistoryRecorder): records utilities at each iteration
+    - on_iteration: observer(s) called after each iteration; may be None
+
+    return: same as value_iteration
+    """
+    is_state = _shared_arrays['is_state'][1:-1, 1:-1]
+    num_states = len(maze.states)
+
+    # for: Plot of utility estimates as a function of the number of iterations
+    history.start(maze.states)
+
+    has_converged = False
+    num_iterations = 0
+
+    # repeat
+    while not has_converged:
+        # U is read from 1 buffer, U′ is written into the other; U ← U′ swaps them
+        read_index = num_iterations % 2
+        current_utilities = _shared_arrays['utilities'][read_index, 1:-1, 1:-1]
+
+        # states are gathered from the grid only when recorded
+        if history.is_recording(num_iterations):
+            history.record(num_iterations, current_utilities[is_state])
+
+        sweep_start_time = time.perf_counter()
+        previous_policy = _shared_arrays['policy'].copy() if on_iteration is not None else None
+
+        # δ ← max |U′[s]−U[s]|, reduced over every strip
+        max_utility_change = max(pool.starmap(
+            _sweep_strip,
+            [
+                (row_start, row_end, read_index, maze.discount, maze.stencil)
+                for row_start, row_end in strips
+            ],
+        ))
+
+        num_iterations += 1
+
+        if verbose:
+            print(
+                'iteration:', num_iterations,
+                '-maximum change in the utility of any state:',
+                '{:.6f}'.format(max_utility_change),
+            )
+
+        if on_iteration is not None and notify(on_iteration, IterationInfo(
+            num_iterations,
+            max_utility_change,
+            int(np.count_nonzero((_shared_arrays['policy'] != previous_policy)[is_state])),
+            time.perf_counter() - sweep_start_time,
+            num_states,
+        )):
+            break
+
+        # until δ < ϵ(1−γ)/γ
+        has_converged = max_utility_change < \
+            max_error * (1 - maze.discount) / maze.discount
+
+    history.finish()
+
+    states = list(maze.states)
+    policy = _shared_arrays['policy'][is_state].tolist()
+
+    return {
+        'utilities': dict(zip(states, current_utilities[is_state].tolist())),
+        'optimal_policy': {
+            state: maze.actions[action_index]
+            for state, action_index in zip(states, policy)
+        },
+        'num_iterations': num_iterations,
+        'iteration_utilities': history.iteration_utilities(),
+        'history': history,
+    }
+
+
+def _import_shared_memory():
+    """
+    Imported only when needed, so that this module can be imported on Python 3.7.
+
+    return: multiprocessing.shared_memory, new in Python 3.8
+    """
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise ImportError(
+            'parallel_value_iteration needs Python 3.8 or later (multiprocessing.shared_memory)'
+        ) from None
+
+    return shared_memory
+
+
+def _attach_shared_arrays(specs):
+    """
+    params:
+    - specs (dict): maps name to (shared memory name, shape, dtype) of each array
+    """
+    shared_memory = _import_shared_memory()
+
+    for name, (block_name, shape, dtype) in specs.items():
+        # the block is kept, so that it is not closed while its array is in use
+        _shared_blocks[name] = shared_memory.SharedMemory(name=block_name)
+        _shared_arrays[name] = np.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=_shared_blocks[name].buf,
+        )
+
+
+def _detach_shared_arrays():
+    """
+    Closes the shared memory blocks attached by _attach_shared_arrays.
+    """
+    _shared_arrays.clear()
+
+    for block in _shared_blocks.values():
+        block.close()
+
+    _shared_blocks.clear()
+
+
+def _sweep_strip(row_start, row_end, read_index, discount, stencil):
+    """
+    U′[s] ← R(s) + γ max a∈A(s) ∑s′P(s′|s, a)U[s′], for every state in a strip of rows.
+
+    params:
+    - row_start (int): first row of the strip
+    - row_end (int): last row of the strip + 1
+    - read_index (int): index of the buffer holding U; U′ is written into the other
+    - discount (float): discount γ
+    - stencil (dict): moves of each action, with probabilities (see maze.ACTION_MOVES)
+
+    return: maximum change in the utility of any state in the strip (float)
+    """
+    utilities = _shared_arrays['utilities']
+    current_utilities = utilities[read_index]
+    is_state = _shared_arrays['is_state']
+    height = is_state.shape[1] - 2
+
+    # rows and columns of the strip, in padded arrays
+    strip = (slice(row_start + 1, row_end + 1), slice(1, height + 1))
+    strip_utilities = current_utilities[strip]
+
+    # U[s′] of every move; invalid state -> remain same spot
+    move_utilities = {}
+
+    for dx, dy in stencil_moves(stencil):
+        neighbours = (
+            slice(row_start + 1 + dx, row_end + 1 + dx),
+            slice(1 + dy, height + 1 + dy),
+        )
+        move_utilities[(dx, dy)] = np.where(
+            is_state[neighbours],
+            current_utilities[neighbours],
+            strip_utilities,
+        )
+
+    # ∑s′P(s′|s, a)U[s′] for every action a
+    expected_utilities = np.stack([
+        sum(probability * move_utilities[(dx, dy)] for dx, dy, probability in moves)
+        for moves in stencil.values()
+    ])
+
+    strip_is_state = is_state[strip]
+    new_utilities = np.where(
+        strip_is_state,
+        _shared_arrays['rewards'][strip] + discount * expected_utilities.max(axis=0),
+        0,
+    )
+
+    utilities[1 - read_index][strip] = new_utilities
+    _shared_arrays['policy'][row_start:row_end] = expected_utilities.argmax(axis=0)
+
+    return float(np.abs(new_utilities - strip_utilities).max(initial=0))
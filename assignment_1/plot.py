@@ -2,30 +2,226 @@
 Contains function for plotting.
 """
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
 
 from assignment_1.config import RESULTS_DIR_PATH
+from assignment_1.history import HistoryRecorder
 
+# largest number of states plotted as 1 line each, with a legend entry each
+MAX_LEGEND_STATES = 50
 
-def plot_utility_vs_iteration(iteration_utilities, save_file_name=None):
+# largest number of states plotted as lines, without a legend;
+# more states are summarised by percentile bands and a heatmap
+MAX_LINE_STATES = 2000
+
+# percentiles of utilities of every state at each iteration, drawn as nested bands
+BAND_PERCENTILES = ((0, 100), (5, 95), (25, 75))
+
+PLOT_MODES = ('auto', 'lines', 'collection', 'bands', 'heatmap')
+
+# largest number of bytes of utilities of every state, at some of the iterations,
+# stacked into 1 array at a time (for percentile bands)
+PLOT_CHUNK_BYTES = 2 ** 25
+
+# largest number of iterations drawn by a heatmap, which are evenly spaced
+# (about the number of pixels across it)
+MAX_HEATMAP_ITERATIONS = 1000
+
+
+def plot_utility_vs_iteration(iteration_utilities, save_file_name=None, show=True, mode='auto'):
     """
     params:
     - iteration_utilities: {
         (x, y): [utility for each iteration (float)]
-    }
+    }, or HistoryRecorder (e.g. result['history']), to plot recorded iterations only
     - save_file_name (str): name of file to save plot as; defaults to None (not saved)
+    - show (bool): whether to show the plot (which waits for its window to be closed),
+        or close it; defaults to True
+    - mode (str): 'lines' plots 1 line per state, with a legend;
+        'collection' plots every line at once (as 1 LineCollection), without a legend;
+        'bands' plots the median, and bands between percentiles, of every state;
+        'heatmap' plots the utility of each state at each iteration as an image;
+        'auto' (default) chooses by number of states: 'lines' up to MAX_LEGEND_STATES,
+        'collection' up to MAX_LINE_STATES, then 'bands' above 'heatmap';
+        without any recorded iteration, every mode other than 'lines' plots empty axes
     """
-    plt.figure(figsize=(16, 8))
+    if mode not in PLOT_MODES:
+        raise ValueError('unknown mode: ' + str(mode))
+
+    iterations = None
+
+    if isinstance(iteration_utilities, HistoryRecorder):
+        iterations = iteration_utilities.iterations
+        iteration_utilities = iteration_utilities.iteration_utilities()
+
+    states = list(iteration_utilities)
+    num_iterations = len(iteration_utilities[states[0]]) if states else 0
+
+    if mode == 'auto':
+        if len(states) <= MAX_LEGEND_STATES:
+            mode = 'lines'
+        elif len(states) <= MAX_LINE_STATES:
+            mode = 'collection'
+
+    if mode == 'lines':
+        plt.figure(figsize=(16, 8))
+
+        for state_position in states:
+            if iterations is None:
+                plt.plot(iteration_utilities[state_position])
+            else:
+                plt.plot(iterations, iteration_utilities[state_position])
+
+        plt.legend(states, loc='center left', bbox_to_anchor=(1, 0.5))
 
-    for state_position in iteration_utilities:
-        plt.plot(iteration_utilities[state_position])
+        plt.title('utility of each state at each iteration')
+        plt.xlabel('iteration')
+        plt.ylabel('utility estimate')
+    elif num_iterations == 0:
+        _, axes = plt.subplots(figsize=(16, 8))
 
-    plt.legend(iteration_utilities, loc='center left', bbox_to_anchor=(1, 0.5))
+        axes.set_title('no recorded iteration of ' + str(len(states)) + ' states')
+        axes.set_xlabel('iteration')
+        axes.set_ylabel('utility estimate')
+    else:
+        # utility at each recorded iteration of each state, not copied if already arrays
+        columns = [
+            np.asarray(iteration_utilities[state_position], dtype=float)
+            for state_position in states
+        ]
 
-    plt.title('utility of each state at each iteration')
-    plt.xlabel('iteration')
-    plt.ylabel('utility estimate')
+        if iterations is None:
+            iterations = np.arange(num_iterations)
+        else:
+            iterations = np.asarray(iterations)
+
+        if mode == 'auto':
+            _, (band_axes, heatmap_axes) = plt.subplots(2, 1, figsize=(16, 12), sharex=True)
+
+            _plot_bands(band_axes, iterations, columns)
+            _plot_heatmap(heatmap_axes, iterations, columns)
+        else:
+            _, axes = plt.subplots(figsize=(16, 8))
+
+            if mode == 'collection':
+                _plot_collection(axes, iterations, columns)
+            elif mode == 'bands':
+                _plot_bands(axes, iterations, columns)
+            else:
+                _plot_heatmap(axes, iterations, columns)
+
+        plt.tight_layout()
 
     if save_file_name is not None:
         plt.savefig(RESULTS_DIR_PATH + save_file_name)
 
-    plt.show()
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+
+def _stack_iterations(columns, selected):
+    """
+    params:
+    - columns (list): utility at each recorded iteration of each state (np.ndarray)
+    - selected: recorded iterations to stack, as a slice or an array of their indices
+
+    return: utility of each state (column) at each selected iteration (row),
+        np.ndarray of shape (selected iterations, S)
+    """
+    return np.array([column[selected] for column in columns]).T
+
+
+def _plot_collection(axes, iterations, columns):
+    """
+    params:
+    - axes (matplotlib.axes.Axes): axes to plot on
+    - iterations (np.ndarray): recorded iterations, shape (T,)
+    - columns (list): utility at each recorded iteration of each state
+        (np.ndarray of shape (T,)), for S states
+    """
+    utilities = _stack_iterations(columns, slice(None))
+    num_iterations, num_states = utilities.shape
+
+    # line of each state, as (iteration, utility) points, shape (S, T, 2)
+    segments = np.empty((num_states, num_iterations, 2))
+    segments[:, :, 0] = iterations
+    segments[:, :, 1] = utilities.T
+
+    colours = plt.get_cmap('viridis')(np.linspace(0, 1, max(num_states, 1)))
+
+    axes.add_collection(LineCollection(segments, colors=colours, linewidths=0.5))
+    axes.autoscale()
+
+    axes.set_title('utility of each state at each iteration (' + str(num_states) + ' states)')
+    axes.set_xlabel('iteration')
+    axes.set_ylabel('utility estimate')
+
+
+def _plot_bands(axes, iterations, columns):
+    """
+    Percentiles are found for a chunk of iterations at a time (see PLOT_CHUNK_BYTES),
+    instead of from the utilities of every state at every iteration at once.
+
+    params: same as _plot_collection
+    """
+    percentiles = sorted({50}.union(*BAND_PERCENTILES))
+    num_states = len(columns)
+    chunk_length = max(PLOT_CHUNK_BYTES // (num_states * 8), 1)
+
+    # value of each percentile (row) at each recorded iteration (column)
+    values = np.empty((len(percentiles), len(iterations)))
+
+    for start in range(0, len(iterations), chunk_length):
+        chunk = _stack_iterations(columns, slice(start, start + chunk_length))
+        values[:, start:start + len(chunk)] = np.percentile(chunk, percentiles, axis=1)
+
+    rows = {percentile: row for row, percentile in zip(values, percentiles)}
+
+    for (low, high), alpha in zip(BAND_PERCENTILES, (0.2, 0.35, 0.5)):
+        axes.fill_between(
+            iterations,
+            rows[low],
+            rows[high],
+            alpha=alpha,
+            color='tab:blue',
+            linewidth=0,
+            label='{}th to {}th percentile'.format(low, high),
+        )
+
+    axes.plot(iterations, rows[50], color='tab:blue', label='median')
+    axes.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+
+    axes.set_title(
+        'utilities of ' + str(num_states) + ' states at each iteration'
+    )
+    axes.set_xlabel('iteration')
+    axes.set_ylabel('utility estimate')
+
+
+def _plot_heatmap(axes, iterations, columns):
+    """
+    Draws at most MAX_HEATMAP_ITERATIONS of the recorded iterations, evenly spaced.
+
+    params: same as _plot_collection
+    """
+    selected = np.unique(np.linspace(
+        0,
+        len(iterations) - 1,
+        min(len(iterations), MAX_HEATMAP_ITERATIONS),
+    ).round().astype(int))
+    utilities = _stack_iterations(columns, selected)
+
+    image = axes.imshow(
+        utilities.T,
+        aspect='auto',
+        interpolation='nearest',
+        extent=(iterations[0], iterations[-1], len(columns), 0),
+    )
+    plt.colorbar(image, ax=axes, label='utility estimate')
+
+    axes.set_title('utility of each state at each iteration')
+    axes.set_xlabel('iteration')
+    axes.set_ylabel('state (in order of states)')
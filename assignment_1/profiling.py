@@ -0,0 +1,159 @@
+"""
+Phase-level profiling of a run: wall time, CPU time,
+and peak memory allocated by Python (tracemalloc) of each phase.
+"""
+import contextlib
+import datetime
+import json
+import time
+import tracemalloc
+
+# shared by every disabled profiler, so that a disabled phase costs nothing
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    usage:
+        profiler = Profiler()
+
+        with profiler.phase('solve'):
+            ...
+
+        print(profiler.summary())
+        profiler.save('profile.json')
+        profiler.close()
+
+    When disabled, phase returns a shared no-op context, and nothing is traced.
+    """
+    def __init__(self, enabled=True, trace_memory=True):
+        """
+        params:
+        - enabled (bool): whether to profile at all
+        - trace_memory (bool): whether to trace peak memory allocated with tracemalloc,
+            which slows down allocations while tracing
+        """
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.phases = []
+
+        # stopped in close only if started here
+        self._started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def phase(self, name):
+        """
+        params:
+        - name (str): name of the phase, as shown in summary and report
+
+        return: context manager that profiles its body
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+
+        return self._profile_phase(name)
+
+    @contextlib.contextmanager
+    def _profile_phase(self, name):
+        if self.trace_memory:
+            if hasattr(tracemalloc, 'reset_peak'):
+                start_memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            else:
+                # before Python 3.9, the peak is reset only by tracing again from nothing,
+                # so memory already allocated at start of phase is not traced at all
+                tracemalloc.stop()
+                tracemalloc.start()
+                start_memory = 0
+
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+
+        try:
+            yield
+        finally:
+            phase = {
+                'name': name,
+                'wall_seconds': time.perf_counter() - start_wall_time,
+                'cpu_seconds': time.process_time() - start_cpu_time,
+                'peak_allocated_bytes': None,
+            }
+
+            if self.trace_memory:
+                # above memory already allocated at start of phase
+                phase['peak_allocated_bytes'] = \
+                    tracemalloc.get_traced_memory()[1] - start_memory
+
+            self.phases.append(phase)
+
+    def report(self, extra=None):
+        """
+        params:
+        - extra (dict): more fields of the report; defaults to None (none)
+
+        returns: {
+            'created': time of report (str),
+            'total_wall_seconds': (float),
+            'total_cpu_seconds': (float),
+            'phases': [
+                {
+                    'name': (str),
+                    'wall_seconds': (float),
+                    'cpu_seconds': (float),
+                    'peak_allocated_bytes': (int), or None if memory is not traced
+                }
+            ],
+            ...every field of extra
+        }
+        """
+        return dict(
+            {
+                'created': datetime.datetime.now().isoformat(),
+                'total_wall_seconds': sum(phase['wall_seconds'] for phase in self.phases),
+                'total_cpu_seconds': sum(phase['cpu_seconds'] for phase in self.phases),
+                'phases': self.phases,
+            },
+            **(extra or {})
+        )
+
+    def summary(self):
+        """
+        returns: table of phases, 1 line each (str)
+        """
+        name_width = max([len('phase')] + [len(phase['name']) for phase in self.phases])
+        lines = [
+            '{:<{}}  {:>10}  {:>10}  {:>12}'.format(
+                'phase', name_width, 'wall (s)', 'cpu (s)', 'peak (MiB)',
+            )
+        ]
+
+        for phase in self.phases:
+            peak = phase['peak_allocated_bytes']
+
+            lines.append('{:<{}}  {:>10.3f}  {:>10.3f}  {:>12}'.format(
+                phase['name'], name_width,
+                phase['wall_seconds'],
+                phase['cpu_seconds'],
+                '-' if peak is None else '{:.2f}'.format(peak / 2 ** 20),
+            ))
+
+        return '\n'.join(lines)
+
+    def save(self, file_path, extra=None):
+        """
+        params:
+        - file_path (str): JSON file to write the report into
+        - extra (dict): more fields of the report; defaults to None (none)
+        """
+        with open(file_path, 'w') as file:
+            json.dump(self.report(extra), file, indent=2)
+
+    def close(self):
+        """
+        Stops tracing memory, if it was started by this profiler.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
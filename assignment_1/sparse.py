@@ -0,0 +1,254 @@
+"""
+Sparse matrix representation of a Markov decision process,
+which can be saved to and loaded from an .npz file.
+
+Lets the algorithms solve any MDP exported by
+MarkovDecisionProcess.transition_matrices, not only a Maze.
+"""
+import numpy as np
+from scipy import sparse
+
+from assignment_1.base import MarkovDecisionProcess
+from assignment_1.compiled import CompiledMDP
+
+
+class SparseMDP(MarkovDecisionProcess):
+    """
+    MDP defined by 1 sparse transition matrix per action and a reward vector.
+
+    With S states and A actions:
+    - states (list): state at each index
+    - actions (list): action at each index
+    - matrices (list): scipy.sparse.csr_matrix of shape (S, S) for each action
+    - rewards (np.ndarray): float array of shape (S,)
+    - discount (float)
+    """
+    __slots__ = ('matrices', 'rewards', 'state_indices')
+
+    def __init__(self, states, actions, transition_matrices, rewards, discount):
+        super().__init__(list(states), list(actions), discount)
+
+        self.matrices = [
+            sparse.csr_matrix(matrix)
+            for matrix in transition_matrices
+        ]
+        self.rewards = np.asarray(rewards, dtype=float)
+        self.state_indices = {
+            state: index
+            for index, state in enumerate(self.states)
+        }
+
+    @classmethod
+    def from_mdp(cls, mdp: MarkovDecisionProcess):
+        """
+        params:
+        - mdp (MarkovDecisionProcess): the MDP to export
+
+        return: SparseMDP
+        """
+        exported = mdp.transition_matrices()
+
+        return cls(
+            exported['states'],
+            exported['actions'],
+            exported['transition_matrices'],
+            exported['rewards'],
+            mdp.discount,
+        )
+
+    def transition_model(self, state, action, next_state) -> float:
+        """
+        params
+        - state: any state in states
+        - action: any action in actions
+        - next_state: any state in states
+
+        return:
+        probability which ranges from 0 to 1, inclusive (float)
+        """
+        matrix = self.matrices[self.actions.index(action)]
+        return float(matrix[self.state_indices[state], self.state_indices[next_state]])
+
+    def reward_function(self, state):
+        """
+        return: reward value (float)
+        """
+        return float(self.rewards[self.state_indices[state]])
+
+    def get_next_states(self, state, action):
+        """
+        Next states are always actual states,
+        since a transition matrix does not keep intended states.
+
+        return: {
+            next_state: {
+                'actual': next_state,
+                'probability': probability (float)
+            }
+        }
+        """
+        return {
+            next_state: {
+                'actual': next_state,
+                'probability': probability,
+            }
+            for next_state, probability in self._row(state, action)
+        }
+
+    def transition_matrices(self):
+        """
+        returns: same as MarkovDecisionProcess.transition_matrices
+        """
+        return {
+            'states': self.states,
+            'actions': self.actions,
+            'transition_matrices': self.matrices,
+            'rewards': self.rewards,
+            'state_indices': self.state_indices,
+        }
+
+    def save(self, file):
+        """
+        params:
+        - file (str or file): .npz file to save to; see load_sparse_mdp
+        """
+        save_sparse_mdp(self, file)
+
+    def compile(self):
+        """
+        Reads the rows of each transition matrix into padded arrays.
+
+        returns: the MDP in array form (CompiledMDP)
+        """
+        if self._compiled is None:
+            num_states = len(self.states)
+            max_num_next_states = max(
+                (np.diff(matrix.indptr).max(initial=0) for matrix in self.matrices),
+                default=1,
+            )
+            shape = (num_states, len(self.actions), max(max_num_next_states, 1))
+
+            # unused slots point back to the state itself with probability 0
+            next_states = np.repeat(
+                np.arange(num_states, dtype=np.intp),
+                shape[1] * shape[2],
+            ).reshape(shape)
+            probabilities = np.zeros(shape)
+
+            for action_index, matrix in enumerate(self.matrices):
+                row_lengths = np.diff(matrix.indptr)
+                rows = np.repeat(np.arange(num_states), row_lengths)
+                slots = np.arange(matrix.nnz) - np.repeat(matrix.indptr[:-1], row_lengths)
+
+                next_states[rows, action_index, slots] = matrix.indices
+                probabilities[rows, action_index, slots] = matrix.data
+
+            self._compiled = CompiledMDP(
+                self.states,
+                self.actions,
+                next_states,
+                probabilities,
+                self.rewards,
+                self.discount,
+            )
+
+        self._compiled.discount = self.discount
+        return self._compiled
+
+    def _build_transition_table(self):
+        """
+        return: transition table (see MarkovDecisionProcess.transition_table)
+        """
+        return {
+            state: {
+                action: tuple(self._row(state, action))
+                for action in self.actions
+            }
+            for state in self.states
+        }
+
+    def _row(self, state, action):
+        """
+        return: generator of (next_state, probability)
+        """
+        matrix = self.matrices[self.actions.index(action)]
+        state_index = self.state_indices[state]
+        start, end = matrix.indptr[state_index], matrix.indptr[state_index + 1]
+
+        for next_state_index, probability in zip(
+            matrix.indices[start:end].tolist(),
+            matrix.data[start:end].tolist(),
+        ):
+            yield self.states[next_state_index], probability
+
+
+def save_sparse_mdp(mdp: MarkovDecisionProcess, file):
+    """
+    Saves the transition matrices, rewards and discount of any MDP.
+    States are saved as an array (e.g. of x, y positions),
+    and actions by name.
+
+    params:
+    - mdp (MarkovDecisionProcess): the MDP to save
+    - file (str or file): .npz file to save to
+    """
+    exported = mdp.transition_matrices()
+    arrays = {}
+
+    for action_index, matrix in enumerate(exported['transition_matrices']):
+        arrays['data_' + str(action_index)] = matrix.data
+        arrays['indices_' + str(action_index)] = matrix.indices
+        arrays['indptr_' + str(action_index)] = matrix.indptr
+
+    np.savez_compressed(
+        file,
+        states=np.array(exported['states']),
+        actions=np.array([
+            getattr(action, 'name', str(action))
+            for action in exported['actions']
+        ]),
+        rewards=exported['rewards'],
+        discount=mdp.discount,
+        **arrays
+    )
+
+
+def load_sparse_mdp(file, action_type=None, discount=None):
+    """
+    params:
+    - file (str or file): .npz file saved by save_sparse_mdp
+    - action_type (enum.Enum): to look up actions by name (e.g. MazeAction);
+        defaults to None (actions are kept as names)
+    - discount (float): overrides the discount saved; defaults to None (not overridden)
+
+    return: SparseMDP
+    """
+    with np.load(file) as arrays:
+        states = arrays['states']
+
+        # e.g. x, y positions are loaded back as tuples
+        states = list(map(tuple, states.tolist())) if states.ndim > 1 else states.tolist()
+        actions = arrays['actions'].tolist()
+
+        if action_type is not None:
+            actions = [action_type[action] for action in actions]
+
+        transition_matrices = [
+            sparse.csr_matrix(
+                (
+                    arrays['data_' + str(action_index)],
+                    arrays['indices_' + str(action_index)],
+                    arrays['indptr_' + str(action_index)],
+                ),
+                shape=(len(states), len(states)),
+            )
+            for action_index in range(len(actions))
+        ]
+
+        return SparseMDP(
+            states,
+            actions,
+            transition_matrices,
+            arrays['rewards'],
+            float(arrays['discount']) if discount is None else discount,
+        )